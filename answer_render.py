@@ -0,0 +1,125 @@
+import re
+import threading
+from collections import OrderedDict
+
+# First number in a cell, e.g. the value of "-1.25%" in the Change % column
+CHANGE_VALUE_PATTERN = re.compile(r'(-?\d+\.?\d*)')
+
+# Rendered answers kept in memory; one per (entry, knowledge-base version)
+RENDER_CACHE_SIZE = 4096
+
+def format_table_with_colors(table_content):
+    """Format table content with color coding for positive and negative numbers"""
+    lines = table_content.split('\n')
+    formatted_lines = []
+
+    for i, line in enumerate(lines):
+        if i >= 2 and line.strip():  # Skip headers and process data rows
+            # Split by tabs to get individual cells
+            cells = line.split('\t')
+            if len(cells) >= 5:
+                # Color code the last column (Change %)
+                change_cell = cells[4]
+                # Extract numeric value
+                change_value = CHANGE_VALUE_PATTERN.search(change_cell)
+                if change_value:
+                    try:
+                        value = float(change_value.group(1))
+                        if value > 0:
+                            # Green for positive values
+                            cells[4] = f"<span style='color: green; font-weight: bold;'>{change_cell}</span>"
+                        elif value < 0:
+                            # Red for negative values
+                            cells[4] = f"<span style='color: red; font-weight: bold;'>{change_cell}</span>"
+                    except ValueError:
+                        # If conversion fails, leave as is
+                        pass
+                # Rejoin the cells
+                line = '\t'.join(cells)
+        formatted_lines.append(line)
+
+    return '\n'.join(formatted_lines)
+
+def format_answer(answer_text):
+    """Answer text as HTML, with code blocks in <pre> and holdings tables colored"""
+    if '```' not in answer_text:
+        # Regular text
+        return answer_text
+    parts = answer_text.split('```')
+    formatted_parts = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            # Regular text
+            formatted_parts.append(part)
+        elif "Company Name" in part and "As on Date" in part:
+            # Holdings table: color the Change % column
+            formatted_table = format_table_with_colors(part)
+            formatted_parts.append(f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto; white-space: pre;'>{formatted_table}</pre>")
+        else:
+            formatted_parts.append(f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto;'>{part}</pre>")
+    return ''.join(formatted_parts)
+
+# (entry ID, knowledge-base version) -> rendered answer; most recently used last
+_rendered = OrderedDict()
+_rendered_lock = threading.Lock()
+
+def answer_html(entry, version=None):
+    """
+    Formatted answer for a search result or FAQ entry. Indexed entries are
+    rendered once per (entry ID, knowledge-base version), so reruns and
+    history messages reuse the HTML, and the answer text is only read on a
+    miss. Entries without an ID (refusals, errors) are short, and before
+    the index has loaded there is no version to tie the HTML to, so both
+    are rendered directly.
+    """
+    entry_id = entry.get('id')
+    if entry_id is None or version is None:
+        return format_answer(entry['answer'])
+    key = (entry_id, version)
+    with _rendered_lock:
+        html = _rendered.get(key)
+        if html is not None:
+            _rendered.move_to_end(key)
+            return html
+    html = format_answer(entry['answer'])
+    with _rendered_lock:
+        _rendered[key] = html
+        if len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return html
+
+def source_link_html(source):
+    """Link to an answer's source"""
+    return f"<a href='{source}' class='source-link' target='_blank'>🔗 Source: {source}</a>"
+
+def response_html(result, version=None):
+    """The response panel for the current question"""
+    return (f"<div class='response-container'><h3>{result['question']}</h3>"
+            f"<div class='answer-text'>{answer_html(result, version)}</div><br>"
+            f"{source_link_html(result['source'])}</div>")
+
+def assistant_message_html(result, version=None, updated=False):
+    """
+    An assistant message in the conversation history; updated marks an
+    answer whose knowledge base changed since the question was asked
+    """
+    note = ("<div class='kb-updated-note'>ℹ️ The knowledge base has been updated since this "
+            "question was asked; showing the current answer.</div>") if updated else ''
+    return (f"<div class='message assistant-message'><strong>Assistant:</strong><br>{note}"
+            f"<div class='answer-text'>{answer_html(result, version)}</div><br>"
+            f"{source_link_html(result['source'])}</div>")
+
+def user_message_html(question):
+    """A user message in the conversation history"""
+    return f"<div class='message user-message'><strong>You:</strong><br>{question}</div>"
+
+def history_html(messages, version=None):
+    """
+    The conversation history for (question, result, updated) triples,
+    oldest first
+    """
+    parts = []
+    for question, result, updated in messages:
+        parts.append(user_message_html(question))
+        parts.append(assistant_message_html(result, version, updated))
+    return f"<div class='chat-container'>{''.join(parts)}</div>"
@@ -0,0 +1,117 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+# Questions handed to a worker at a time; one encoder call per batch
+DEFAULT_BATCH_SIZE = 256
+
+def read_questions(input_path):
+    """
+    Yield (id, question) pairs from a JSONL file with a 'question' field or
+    a CSV file with a 'question' column. The optional 'id' field or column
+    is passed through; otherwise the 1-based line or row number is used.
+    """
+    with open(input_path, 'r', encoding='utf-8', newline='') as f:
+        if input_path.lower().endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, start=1):
+            yield row.get('id', number), row['question']
+
+def batches(items, size):
+    """Split an iterable into lists of at most size items"""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def init_worker(threads):
+    """
+    Load the index in a worker process from the prebuilt artifact. IVF
+    artifacts are memory-mapped, so workers share one copy of their
+    vectors; flat and HNSW indexes are loaded per worker.
+    """
+    # Keep workers from oversubscribing the cores with BLAS/torch threads
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    from vector_db import initialize_vector_db
+    initialize_vector_db().warm_up()
+
+def answer_batch(batch, include_answers=False):
+    """Answer one batch of (id, question) pairs; returns output records"""
+    from faq_engine import find_relevant_faq_batch
+    start = time.perf_counter()
+    answers = find_relevant_faq_batch([question for _, question in batch])
+    latency_ms = (time.perf_counter() - start) * 1000 / len(batch)
+    records = []
+    for (question_id, question), (result, stage) in zip(batch, answers):
+        record = {
+            'id': question_id,
+            'question': question,
+            'stage': stage,
+            'entry_id': result.get('id'),
+            'matched_question': result.get('question'),
+            'source': result.get('source'),
+            'score': result.get('score'),
+            'bm25_score': result.get('bm25_score'),
+            'rrf_score': result.get('rrf_score'),
+            'latency_ms': round(latency_ms, 3)
+        }
+        if include_answers:
+            record['answer'] = result.get('answer')
+        if 'error' in result:
+            record['error'] = result['error']
+        records.append(record)
+    return records
+
+def run(input_path, output_path, workers=None, batch_size=DEFAULT_BATCH_SIZE, include_answers=False):
+    """Answer every question in input_path and write JSONL records to output_path"""
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+    stages = Counter()
+    total = 0
+    jobs = batches(read_questions(input_path), batch_size)
+    with open(output_path, 'w', encoding='utf-8') as out:
+        def write(records):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stages[record['stage']] += 1
+            return len(records)
+
+        if workers == 1:
+            init_worker(threads)
+            for batch in jobs:
+                total += write(answer_batch(batch, include_answers))
+        else:
+            with multiprocessing.Pool(workers, initializer=init_worker, initargs=(threads,)) as pool:
+                # imap keeps input order while workers run ahead
+                for records in pool.imap(_answer_batch_job, ((batch, include_answers) for batch in jobs)):
+                    total += write(records)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Answered {total:,} questions in {elapsed:.1f}s ({rate:,.0f}/s) with {workers} workers")
+    print("Stages: " + ', '.join(f"{stage} {count:,}" for stage, count in stages.most_common()))
+    return total
+
+def _answer_batch_job(job):
+    """Pool.imap entry point: answer_batch over a (batch, include_answers) pair"""
+    return answer_batch(*job)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the FAQ pipeline")
+    parser.add_argument('input', help="JSONL with a 'question' field, or CSV with a 'question' column")
+    parser.add_argument('output', help="JSONL results")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--include-answers', action='store_true', help="Also write the answer text")
+    args = parser.parse_args()
+    run(args.input, args.output, args.workers, args.batch_size, args.include_answers)
@@ -0,0 +1,822 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+
+# numpy, faiss and the search modules are imported by the subcommands that
+# use them, so the pure-Python benchmarks run without them
+
+def synthetic_corpus(n, dimension=384, n_clusters=1000, seed=0, return_clusters=False):
+    """Generate L2-normalized clustered vectors resembling sentence embeddings,
+    optionally with the cluster each vector was drawn from"""
+    import faiss
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype('float32')
+    vectors = np.empty((n, dimension), dtype='float32')
+    clusters = np.empty(n, dtype='int64')
+    # Fill in chunks to keep peak memory close to the final array
+    chunk = 100000
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        assignment = rng.integers(0, n_clusters, size)
+        clusters[start:start + size] = assignment
+        vectors[start:start + size] = centers[assignment] + 0.6 * rng.standard_normal((size, dimension)).astype('float32')
+    faiss.normalize_L2(vectors)
+    if return_clusters:
+        return vectors, clusters
+    return vectors
+
+def synthetic_queries(corpus, n_queries=1000, seed=1, return_picks=False):
+    """Perturbed copies of corpus vectors, like paraphrased questions,
+    optionally with the corpus row each query was copied from"""
+    import faiss
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(corpus), n_queries)
+    queries = corpus[picks] + 0.05 * rng.standard_normal((n_queries, corpus.shape[1])).astype('float32')
+    faiss.normalize_L2(queries)
+    if return_picks:
+        return queries, picks
+    return queries
+
+def recall_at_k(found, truth, k):
+    """Mean fraction of the true top-k neighbours returned in the top-k"""
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+def time_index(index, queries, k, single_queries=200):
+    """Return (results, p50 single-query latency in ms, batch queries per second)"""
+    latencies = []
+    for query in queries[:single_queries]:
+        start = time.perf_counter()
+        index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    qps = len(queries) / (time.perf_counter() - start)
+    return found, statistics.median(latencies), qps
+
+def ann_configurations(n):
+    """Index kinds and parameter sweeps to compare for a corpus of size n"""
+    nlist = 1024 if n <= 200000 else 4096
+    return [
+        ('flat', {}, [{}]),
+        ('hnsw', {'M': 16, 'efConstruction': 200}, [{'efSearch': ef} for ef in (16, 32, 64, 128)]),
+        ('hnsw', {'M': 32, 'efConstruction': 200}, [{'efSearch': ef} for ef in (16, 32, 64, 128)]),
+        ('ivf', {'nlist': nlist}, [{'nprobe': p} for p in (1, 4, 16, 64)])
+    ]
+
+def benchmark_ann(args):
+    """Recall-vs-latency report for flat, HNSW and IVF-Flat on synthetic corpora"""
+    from vector_db import build_index, set_search_params
+    lines = [
+        "# ANN backend recall vs latency",
+        "",
+        f"Synthetic clustered corpora, dimension {args.dimension}, cosine metric, "
+        f"{args.queries} queries, recall@{args.k} against exact search.",
+        ""
+    ]
+    for n in args.sizes:
+        print(f"Generating {n:,} vectors...")
+        corpus = synthetic_corpus(n, args.dimension)
+        queries = synthetic_queries(corpus, args.queries)
+        exact = build_index('flat', args.dimension)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        lines += [f"## {n:,} entries", "",
+                  "| index | build params | search params | build s | recall@k | p50 ms | QPS |",
+                  "|---|---|---|---|---|---|---|"]
+        for kind, build_params, sweeps in ann_configurations(n):
+            index = build_index(kind, args.dimension, 'cosine', build_params)
+            start = time.perf_counter()
+            if not index.is_trained:
+                index.train(corpus[:max(100000, 39 * build_params.get('nlist', 1))])
+            index.add(corpus)
+            build_seconds = time.perf_counter() - start
+            for search_params in sweeps:
+                set_search_params(index, kind, search_params)
+                found, p50, qps = time_index(index, queries, args.k)
+                recall = recall_at_k(found, truth, args.k)
+                row = f"| {kind} | {build_params or '-'} | {search_params or '-'} | {build_seconds:.1f} | {recall:.3f} | {p50:.3f} | {qps:,.0f} |"
+                lines.append(row)
+                print(row)
+            del index
+        lines.append("")
+        del corpus, exact
+
+    report = '\n'.join(lines)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def benchmark_memory(args):
+    """Index memory per million entries and recall@1 lost for each storage type"""
+    import faiss
+    from vector_db import build_index, STORAGE_TYPES
+    print(f"Generating {args.size:,} vectors...")
+    corpus = synthetic_corpus(args.size, args.dimension)
+    queries = synthetic_queries(corpus, args.queries)
+    exact = build_index('flat', args.dimension)
+    exact.add(corpus)
+    _, truth = exact.search(queries, 1)
+    del exact
+
+    rows = ["| storage | bytes/entry | MB per 1M entries | recall@1 |", "|---|---|---|---|"]
+    for storage in STORAGE_TYPES:
+        index = build_index('flat', args.dimension, 'cosine', {'pq_m': args.pq_m}, storage)
+        if not index.is_trained:
+            index.train(corpus[:min(len(corpus), 100000)])
+        index.add(corpus)
+        # The serialized size is the code storage plus small codebooks
+        size = faiss.serialize_index(index).nbytes
+        _, found = index.search(queries, 1)
+        recall = recall_at_k(found, truth, 1)
+        rows.append(f"| {storage} | {size / args.size:.1f} | {size / args.size * 1e6 / 2**20:,.0f} | {recall:.3f} |")
+        print(rows[-1])
+        del index
+
+    report = '\n'.join([
+        "# Quantized embedding storage",
+        "",
+        f"{args.size:,} synthetic {args.dimension}-d vectors in a flat cosine index, "
+        f"{args.queries} queries, recall@1 against float32 exact search. PQ uses {args.pq_m} sub-quantizers.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def shard_distance_count(kind):
+    """Distance computations recorded by FAISS since the last reset_shard_stats"""
+    import faiss
+    if kind == 'hnsw':
+        return faiss.cvar.hnsw_stats.ndis
+    if kind == 'ivf':
+        return faiss.cvar.indexIVF_stats.ndis
+    return None
+
+def reset_shard_stats():
+    """Zero the FAISS HNSW and IVF search counters"""
+    import faiss
+    faiss.cvar.hnsw_stats.reset()
+    faiss.cvar.indexIVF_stats.reset()
+
+def search_shards(shards, query, k):
+    """Search the given shard indexes for one query and merge their top k IDs,
+    the way VectorDB.search_batch merges shards"""
+    hits = []
+    for index in shards:
+        scores, ids = index.search(query.reshape(1, -1), min(k, index.ntotal))
+        hits.extend((float(score), int(i)) for score, i in zip(scores[0], ids[0]) if i != -1)
+    hits.sort(reverse=True)
+    return [i for _, i in hits[:k]]
+
+def benchmark_shards(args):
+    """Vectors examined per query when routed to its scheme shard vs fanned out across all shards"""
+    import faiss
+    import numpy as np
+    from vector_db import build_index, set_search_params
+    print(f"Generating {args.size:,} vectors...")
+    corpus, clusters = synthetic_corpus(args.size, args.dimension, return_clusters=True)
+    queries, picks = synthetic_queries(corpus, args.queries, return_picks=True)
+    exact = build_index('flat', args.dimension)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    del exact
+    # Clusters stand in for schemes; shard 0 plays the general shard that
+    # every routed query also searches
+    shard_of = clusters % args.shards
+    query_shards = shard_of[picks]
+
+    rows = ["| index | queries | vectors in searched shards | distance computations | recall@k | p50 ms |",
+            "|---|---|---|---|---|---|"]
+    for kind, build_params, search_params in (
+            ('flat', {}, {}),
+            ('hnsw', {'M': 32, 'efConstruction': 200}, {'efSearch': 64}),
+            ('ivf', {'nlist': args.nlist}, {'nprobe': args.nprobe})):
+        shards = []
+        for key in range(args.shards):
+            ids = np.flatnonzero(shard_of == key)
+            params = dict(build_params)
+            if kind == 'ivf':
+                # As VectorDB does for small shards, shrink nlist to fit the data
+                params['nlist'] = max(1, min(args.nlist, len(ids) // 39))
+            raw_index = build_index(kind, args.dimension, 'cosine', params)
+            if not raw_index.is_trained:
+                raw_index.train(corpus[ids])
+            set_search_params(raw_index, kind, search_params)
+            # Stored under corpus row IDs, as VectorDB stores entry IDs
+            index = faiss.IndexIDMap2(raw_index)
+            index.add_with_ids(corpus[ids], ids)
+            shards.append(index)
+
+        for mode in ('unrouted', 'routed'):
+            found, latencies, vectors = [], [], 0
+            reset_shard_stats()
+            for query, key in zip(queries, query_shards):
+                searched = shards if mode == 'unrouted' else [shards[key]] + ([shards[0]] if key != 0 else [])
+                vectors += sum(index.ntotal for index in searched)
+                start = time.perf_counter()
+                found.append(search_shards(searched, query, args.k))
+                latencies.append((time.perf_counter() - start) * 1000)
+            distances = shard_distance_count(kind)
+            if distances is None:
+                # Flat search compares the query with every stored vector
+                distances = vectors
+            recall = recall_at_k(found, truth, args.k)
+            row = (f"| {kind} | {mode} | {vectors / len(queries):,.0f} | {distances / len(queries):,.0f} "
+                   f"| {recall:.3f} | {statistics.median(latencies):.3f} |")
+            rows.append(row)
+            print(row)
+        del shards
+
+    report = '\n'.join([
+        "# Scheme shard routing",
+        "",
+        f"{args.size:,} synthetic {args.dimension}-d vectors in {args.shards} shards, cosine metric, "
+        f"{args.queries} queries, recall@{args.k} against exact search over all vectors. Routed queries "
+        f"search their own shard and the general shard; unrouted ones fan out across every shard. "
+        f"Per-shard parameters: HNSW M=32 efSearch=64, IVF nlist<={args.nlist} nprobe={args.nprobe}. "
+        f"Counts are per query.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+# Modules that must not be imported until the first search
+DEFERRED_MODULES = ('faiss', 'sentence_transformers', 'torch')
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import vector_db
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+def benchmark_import_time(args):
+    """Fail if importing vector_db exceeds the budget or eagerly loads heavy modules"""
+    timings = []
+    for _ in range(args.runs):
+        # A fresh interpreter each time, so nothing is already imported
+        output = subprocess.run([sys.executable, '-c', IMPORT_PROBE % (DEFERRED_MODULES,)],
+                                capture_output=True, text=True, check=True).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe['seconds'])
+        if probe['loaded']:
+            print(f"FAIL: importing vector_db loaded {', '.join(probe['loaded'])}")
+            sys.exit(1)
+    best = min(timings)
+    print(f"import vector_db: best {best * 1000:.1f} ms over {args.runs} runs (budget {args.budget_ms} ms)")
+    if best * 1000 > args.budget_ms:
+        print("FAIL: import time over budget")
+        sys.exit(1)
+    print("OK")
+
+def encoder_sentences(faq_file_path='mf_faq_data.json'):
+    """Stored FAQ questions plus lowercased variants, as realistic encoder input"""
+    with open(faq_file_path, 'r', encoding='utf-8') as f:
+        questions = [entry['question'] for entry in json.load(f)]
+    return questions + [question.lower().rstrip('?') for question in questions]
+
+def time_encoder(encoder, sentences, single_queries=100):
+    """Return (p50 single-query latency in ms, batch sentences per second)"""
+    encoder.encode(sentences[:8])  # warm up
+    latencies = []
+    for sentence in sentences[:single_queries]:
+        start = time.perf_counter()
+        encoder.encode([sentence])
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    encoder.encode(sentences, batch_size=64)
+    throughput = len(sentences) / (time.perf_counter() - start)
+    return statistics.median(latencies), throughput
+
+def benchmark_encoder(args):
+    """Check ONNX / PyTorch embedding agreement and compare their latency"""
+    import numpy as np
+    from encoders import MIN_ONNX_COSINE, load_encoder, OnnxEncoder
+    if args.min_cosine is None:
+        args.min_cosine = MIN_ONNX_COSINE
+    sentences = encoder_sentences(args.faq_file)
+    reference = load_encoder(args.model, backend='torch')
+    reference_vectors = np.asarray(reference.encode(sentences, normalize_embeddings=True), dtype='float32')
+
+    rows = ["| backend | min cosine vs torch | mean cosine | p50 ms/query | sentences/s |", "|---|---|---|---|---|"]
+    p50, throughput = time_encoder(reference, sentences)
+    rows.append(f"| torch | 1.0000 | 1.0000 | {p50:.2f} | {throughput:,.0f} |")
+    print(rows[-1])
+
+    failed = False
+    for quantized in (False, True):
+        encoder = OnnxEncoder(args.onnx_dir, quantized=quantized)
+        if quantized and not encoder.config.get('quantized'):
+            print("No int8 graph exported; only the unquantized one is checked")
+            continue
+        vectors = encoder.encode(sentences)
+        cosines = (vectors * reference_vectors).sum(axis=1)
+        p50, throughput = time_encoder(encoder, sentences)
+        name = 'onnx-int8' if quantized else 'onnx'
+        rows.append(f"| {name} | {cosines.min():.4f} | {cosines.mean():.4f} | {p50:.2f} | {throughput:,.0f} |")
+        print(rows[-1])
+        if cosines.min() < args.min_cosine:
+            print(f"FAIL: {name} cosine agreement {cosines.min():.4f} below {args.min_cosine}")
+            failed = True
+
+    report = '\n'.join([
+        "# Encoder backends",
+        "",
+        f"{len(sentences)} FAQ questions and variants, {args.model}, CPU.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+    if failed:
+        # Gate: a backend below the agreement threshold must not be deployed
+        sys.exit(1)
+    print(f"OK: every ONNX graph agrees with torch to cosine >= {args.min_cosine}")
+
+def random_phrases(count, seed=0):
+    """Synthetic compliance phrases of one to four lowercase words"""
+    rng = random.Random(seed)
+    words = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 8))) for _ in range(5000)]
+    return [' '.join(rng.choices(words, k=rng.randint(1, 4))) for _ in range(count)]
+
+def benchmark_opinion_filter(args):
+    """Per-query cost of the phrase automaton vs the substring loop as the list grows"""
+    from opinion_filter import PhraseMatcher, load_phrases
+    questions = [question.lower() for question in encoder_sentences(args.faq_file)]
+    base_phrases = load_phrases()
+    rows = ["| phrases | automaton µs/query | substring loop µs/query | compile ms |", "|---|---|---|---|"]
+    print('\n'.join(rows))
+    for count in args.sizes:
+        phrases = base_phrases + random_phrases(max(0, count - len(base_phrases)))
+        start = time.perf_counter()
+        matcher = PhraseMatcher(phrases)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for question in questions:
+                matcher.find(question)
+        automaton_us = (time.perf_counter() - start) / (args.repeat * len(questions)) * 1e6
+
+        start = time.perf_counter()
+        for question in questions:
+            any(phrase in question for phrase in phrases)
+        loop_us = (time.perf_counter() - start) / len(questions) * 1e6
+
+        rows.append(f"| {len(phrases):,} | {automaton_us:.1f} | {loop_us:.1f} | {compile_ms:.1f} |")
+        print(rows[-1])
+
+    report = '\n'.join([
+        "# Opinion filter cost",
+        "",
+        f"{len(questions)} lowercased FAQ questions and variants from {args.faq_file}; the automaton "
+        f"timed over {args.repeat} passes, the substring loop over one. Phrase lists are the shipped "
+        f"compliance phrases padded with synthetic ones.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def synthetic_kb(n, faq_file_path='mf_faq_data.json'):
+    """n FAQ entries cycled from the real knowledge base, with distinct questions"""
+    with open(faq_file_path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    for i in range(n):
+        entry = base[i % len(base)]
+        yield {'question': f"{entry['question']} ({i})", 'answer': entry['answer'], 'source': entry['source']}
+
+KB_LOAD_PROBE = """
+import json, sys, time
+sys.path.insert(0, %r)
+kind, path = %r, %r
+start = time.perf_counter()
+if kind == 'json':
+    from text_utils import entry_id
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = {entry_id(entry['question']): entry for entry in json.load(f)}
+    answer = lambda entry: entry['answer']
+else:
+    from kb_snapshot import KBSnapshot
+    entries = KBSnapshot(path).entries()
+    answer = lambda entry: entry.answer
+elapsed = time.perf_counter() - start
+# One displayed answer, as a session that asks a single question would need
+start = time.perf_counter()
+answer(next(iter(entries.values())))
+first_answer = time.perf_counter() - start
+# VmHWM, unlike ru_maxrss, starts afresh at exec instead of inheriting the parent's peak
+with open('/proc/self/status') as f:
+    peak_kb = int(next(line for line in f if line.startswith('VmHWM')).split()[1])
+print(json.dumps({'seconds': elapsed, 'first_answer_seconds': first_answer, 'max_rss_kb': peak_kb}))
+"""
+
+def benchmark_snapshot(args):
+    """Startup time and peak RSS of loading the knowledge base from JSON vs a binary snapshot"""
+    import os
+    import tempfile
+    from faq_entry import as_entry
+    from kb_snapshot import write_snapshot
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'kb.json')
+        snapshot_path = os.path.join(tmp, 'kb.snap')
+        print(f"Writing {args.size:,} synthetic entries...")
+        entries = list(synthetic_kb(args.size, args.faq_file))
+        with open(json_path, 'w', encoding='utf-8') as f:
+            # Pretty-printed like mf_faq_data.json
+            json.dump(entries, f, indent=2)
+        write_snapshot(snapshot_path, map(as_entry, entries))
+        del entries
+
+        rows = ["| format | file MB | load s | first answer ms | peak RSS MB |", "|---|---|---|---|---|"]
+        here = os.path.dirname(os.path.abspath(__file__))
+        for kind, path in (('json', json_path), ('snapshot', snapshot_path)):
+            # A fresh interpreter each time, so RSS is the loader's alone
+            output = subprocess.run([sys.executable, '-c', KB_LOAD_PROBE % (here, kind, path)],
+                                    capture_output=True, text=True, check=True).stdout
+            probe = json.loads(output.strip().splitlines()[-1])
+            rows.append(f"| {kind} | {os.path.getsize(path) / 2**20:,.0f} | {probe['seconds']:.2f} | "
+                        f"{probe['first_answer_seconds'] * 1000:.3f} | {probe['max_rss_kb'] / 1024:,.0f} |")
+            print(rows[-1])
+
+    report = '\n'.join([
+        "# Knowledge-base snapshot",
+        "",
+        f"{args.size:,} synthetic entries cycled from {args.faq_file}, loaded into an entry-ID map "
+        f"in a fresh interpreter. The snapshot reads answers from the mapped file on access.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def benchmark_entry_memory(args):
+    """Python heap per loaded entry: JSON dicts vs FAQEntry records vs snapshot entries"""
+    import os
+    import tempfile
+    import tracemalloc
+    from faq_entry import as_entry
+    from kb_snapshot import KBSnapshot, write_snapshot
+    from text_utils import entry_id
+    text = json.dumps(list(synthetic_kb(args.size, args.faq_file)))
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'kb.snap')
+        write_snapshot(snapshot_path, map(as_entry, json.loads(text)))
+        loaders = [
+            ('dict per entry (json.load)', lambda: {entry_id(entry['question']): entry for entry in json.loads(text)}),
+            ('FAQEntry, interned sources', lambda: {entry.id: entry for entry in map(as_entry, json.loads(text))}),
+            ('FAQEntry from snapshot (answers mmapped)', lambda: KBSnapshot(snapshot_path).entries())
+        ]
+        rows = ["| entries held as | bytes/entry | MB total |", "|---|---|---|"]
+        for name, load in loaders:
+            # Only what the loaded entries keep alive is still traced afterwards
+            tracemalloc.start()
+            entries = load()
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            rows.append(f"| {name} | {retained / len(entries):,.0f} | {retained / 2**20:,.1f} |")
+            print(rows[-1])
+            del entries
+
+    report = '\n'.join([
+        "# Knowledge-base entry memory",
+        "",
+        f"{args.size:,} synthetic entries cycled from {args.faq_file}, held in an entry-ID map; "
+        f"Python heap retained after loading, measured with tracemalloc.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+# Module-level retrieval entry points of the current app (faq_engine) and
+# of earlier versions, which searched vector_db directly
+RETRIEVAL_ENTRY_POINTS = (
+    ('faq_engine', 'find_relevant_faq'),
+    ('vector_db', 'search_similar_questions'),
+    ('vector_db', 'hybrid_search_similar_questions')
+)
+
+def count_retrievals():
+    """
+    Wrap the retrieval entry points so each outermost call counts as one
+    retrieval, whichever app version makes it; a search made from inside
+    find_relevant_faq is part of the same retrieval. Returns a function
+    giving the count so far.
+    """
+    import functools
+    import importlib
+    import threading
+    nesting = threading.local()
+    count = [0]
+    for module_name, name in RETRIEVAL_ENTRY_POINTS:
+        module = importlib.import_module(module_name)
+
+        @functools.wraps(getattr(module, name))
+        def counted(*args, _func=getattr(module, name), **kwargs):
+            depth = getattr(nesting, 'depth', 0)
+            if depth == 0:
+                count[0] += 1
+            nesting.depth = depth + 1
+            try:
+                return _func(*args, **kwargs)
+            finally:
+                nesting.depth = depth
+        setattr(module, name, counted)
+    return lambda: count[0]
+
+def benchmark_rerun(args):
+    """Server time and retrievals per Streamlit interaction, for one or more app versions"""
+    # AppTest needs streamlit >= 1.28
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    questions = encoder_sentences(args.faq_file)[:args.questions]
+    # Apps import the entry points on every run, so they pick up the wrappers
+    search_calls = count_retrievals()
+    rows = ["| app | first run ms | p50 ms/submission | p50 ms/idle rerun | retrievals/submission | retrievals/idle rerun |",
+            "|---|---|---|---|---|---|"]
+    for app_path in args.apps:
+        st.cache_data.clear()
+        app = AppTest.from_file(app_path, default_timeout=args.timeout)
+        start = time.perf_counter()
+        app.run()
+        first_run_ms = (time.perf_counter() - start) * 1000
+
+        submit_ms, rerun_ms = [], []
+        submit_calls = rerun_calls = 0
+        for question in questions:
+            calls = search_calls()
+            start = time.perf_counter()
+            app.text_input[0].input(question).run()
+            submit_ms.append((time.perf_counter() - start) * 1000)
+            submit_calls += search_calls() - calls
+
+            # A rerun with the same question in the box, as after any widget click
+            calls = search_calls()
+            start = time.perf_counter()
+            app.run()
+            rerun_ms.append((time.perf_counter() - start) * 1000)
+            rerun_calls += search_calls() - calls
+
+        rows.append(f"| {app_path} | {first_run_ms:.0f} | {statistics.median(submit_ms):.1f} | {statistics.median(rerun_ms):.1f} | "
+                    f"{submit_calls / len(questions):.1f} | {rerun_calls / len(questions):.1f} |")
+        print(rows[-1])
+
+    report = '\n'.join([
+        "# Streamlit rerun latency",
+        "",
+        f"{len(questions)} questions submitted through AppTest, each followed by one idle rerun.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def deep_sizeof(obj, seen=None):
+    """Bytes held by an object and everything it references (containers and strings)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+def benchmark_session_memory(args):
+    """Chat history footprint of one Streamlit session as questions accumulate"""
+    from streamlit.testing.v1 import AppTest
+    sentences = encoder_sentences(args.faq_file)
+    app = AppTest.from_file(args.app, default_timeout=args.timeout)
+    app.run()
+    rows = ["| questions asked | chat history bytes |", "|---|---|"]
+    print('\n'.join(rows))
+    checkpoints = set(args.checkpoints)
+    for n in range(1, max(checkpoints) + 1):
+        # Distinct text, so every question counts as a new submission
+        question = sentences[n % len(sentences)] + ' ' * (n // len(sentences))
+        app.text_input[0].input(question).run()
+        if n in checkpoints:
+            rows.append(f"| {n:,} | {deep_sizeof(app.session_state['chat_history']):,} |")
+            print(rows[-1])
+
+    report = '\n'.join([
+        "# Session chat history memory",
+        "",
+        f"Distinct questions submitted through AppTest to {args.app}; bytes held by the session's "
+        f"chat_history, counting the containers and strings it references.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def start_streamlit(app_path, port, timeout):
+    """Run an app under a headless Streamlit server and wait until it is healthy"""
+    import urllib.request
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', app_path,
+                               '--server.headless', 'true', '--server.port', str(port),
+                               '--server.enableXsrfProtection', 'false',
+                               '--browser.gatherUsageStats', 'false'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"Streamlit server for {app_path} did not start within {timeout}s")
+
+async def measure_interactions(port, questions, timeout):
+    """
+    Drive one browser session over the websocket protocol. Returns the
+    (ms, bytes received) of the initial page load and of each question
+    typed into the text input.
+    """
+    from tornado.websocket import websocket_connect
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    connection = await websocket_connect(f'ws://localhost:{port}/_stcore/stream', subprotocols=['streamlit'])
+    text_input = {}
+
+    async def rerun(widget_value=None):
+        """Send one rerun request and read messages until the script run ends"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        if widget_value is not None:
+            widget = msg.rerun_script.widget_states.widgets.add()
+            widget.id = text_input['id']
+            widget.string_value = widget_value
+            if text_input.get('fragment_id'):
+                msg.rerun_script.fragment_id = text_input['fragment_id']
+        start = time.perf_counter()
+        await connection.write_message(msg.SerializeToString(), binary=True)
+        received = 0
+        while True:
+            data = await asyncio.wait_for(connection.read_message(), timeout)
+            if data is None:
+                raise RuntimeError("Streamlit closed the websocket")
+            received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof('type')
+            if kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                if element.WhichOneof('type') == 'text_input' and 'id' not in text_input:
+                    text_input['id'] = element.text_input.id
+                    text_input['fragment_id'] = forward.delta.fragment_id
+            elif kind == 'script_finished':
+                return (time.perf_counter() - start) * 1000, received
+
+    try:
+        page_load = await rerun()
+        return page_load, [await rerun(question) for question in questions]
+    finally:
+        connection.close()
+
+def benchmark_payload(args):
+    """Server time and websocket bytes per interaction, for one or more app versions"""
+    import socket
+    questions = encoder_sentences(args.faq_file)[:args.questions]
+    rows = ["| app | page load ms | page load KB | p50 ms/question | p50 KB/question | last question KB |",
+            "|---|---|---|---|---|---|"]
+    for app_path in args.apps:
+        with socket.socket() as probe:
+            probe.bind(('localhost', 0))
+            port = probe.getsockname()[1]
+        server = start_streamlit(app_path, port, args.timeout)
+        try:
+            # The first session pays for loading the index and the encoder
+            asyncio.run(measure_interactions(port, questions[:1], args.timeout))
+            page_load, interactions = asyncio.run(measure_interactions(port, questions, args.timeout))
+        finally:
+            server.terminate()
+            server.wait()
+        ms = [interaction[0] for interaction in interactions]
+        kb = [interaction[1] / 1024 for interaction in interactions]
+        rows.append(f"| {app_path} | {page_load[0]:.0f} | {page_load[1] / 1024:.1f} | {statistics.median(ms):.1f} | "
+                    f"{statistics.median(kb):.1f} | {kb[-1]:.1f} |")
+        print(rows[-1])
+
+    report = '\n'.join([
+        "# Streamlit interaction cost",
+        "",
+        f"One session, {len(questions)} questions typed into the text input, measured over the websocket.",
+        ""
+    ] + rows)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + '\n')
+    print(f"Report written to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the FAQ assistant")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ann = subparsers.add_parser('ann', help="Recall vs latency of the ANN index backends")
+    ann.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    ann.add_argument('--dimension', type=int, default=384)
+    ann.add_argument('--queries', type=int, default=1000)
+    ann.add_argument('--k', type=int, default=10)
+    ann.add_argument('--output', default='ann_report.md')
+    ann.set_defaults(func=benchmark_ann)
+
+    memory = subparsers.add_parser('memory', help="Memory and recall of the vector storage types")
+    memory.add_argument('--size', type=int, default=1000000)
+    memory.add_argument('--dimension', type=int, default=384)
+    memory.add_argument('--queries', type=int, default=1000)
+    memory.add_argument('--pq-m', type=int, default=48)
+    memory.add_argument('--output', default='memory_report.md')
+    memory.set_defaults(func=benchmark_memory)
+
+    shards = subparsers.add_parser('shards', help="Vectors examined by routed vs unrouted shard search")
+    shards.add_argument('--size', type=int, default=200000)
+    shards.add_argument('--dimension', type=int, default=384)
+    shards.add_argument('--shards', type=int, default=40)
+    shards.add_argument('--queries', type=int, default=1000)
+    shards.add_argument('--k', type=int, default=10)
+    shards.add_argument('--nlist', type=int, default=256)
+    shards.add_argument('--nprobe', type=int, default=16)
+    shards.add_argument('--output', default='shards_report.md')
+    shards.set_defaults(func=benchmark_shards)
+
+    import_time = subparsers.add_parser('import-time', help="Check the vector_db import-time budget")
+    import_time.add_argument('--budget-ms', type=float, default=300)
+    import_time.add_argument('--runs', type=int, default=5)
+    import_time.set_defaults(func=benchmark_import_time)
+
+    encoder = subparsers.add_parser('encoder', help="ONNX vs PyTorch encoder agreement and latency")
+    encoder.add_argument('--model', default='all-MiniLM-L6-v2')
+    encoder.add_argument('--onnx-dir', default='onnx_model')
+    encoder.add_argument('--faq-file', default='mf_faq_data.json')
+    encoder.add_argument('--min-cosine', type=float, default=None,
+                         help="Minimum cosine agreement with torch (default: encoders.MIN_ONNX_COSINE)")
+    encoder.add_argument('--output', default='encoder_report.md')
+    encoder.set_defaults(func=benchmark_encoder)
+
+    opinion = subparsers.add_parser('opinion-filter', help="Opinion filter cost vs phrase list size")
+    opinion.add_argument('--sizes', type=int, nargs='+', default=[15, 100, 1000, 10000])
+    opinion.add_argument('--repeat', type=int, default=20)
+    opinion.add_argument('--faq-file', default='mf_faq_data.json')
+    opinion.add_argument('--output', default='opinion_filter_report.md')
+    opinion.set_defaults(func=benchmark_opinion_filter)
+
+    rerun = subparsers.add_parser('rerun', help="Server time and retrievals per Streamlit interaction")
+    rerun.add_argument('--apps', nargs='+', default=['streamlit_app.py'],
+                       help="App scripts to compare, e.g. an older streamlit_app.py saved with git show")
+    rerun.add_argument('--questions', type=int, default=20)
+    rerun.add_argument('--timeout', type=float, default=120)
+    rerun.add_argument('--faq-file', default='mf_faq_data.json')
+    rerun.add_argument('--output', default='rerun_report.md')
+    rerun.set_defaults(func=benchmark_rerun)
+
+    session_memory = subparsers.add_parser('session-memory', help="Per-session chat history footprint")
+    session_memory.add_argument('--app', default='streamlit_app.py')
+    session_memory.add_argument('--checkpoints', type=int, nargs='+', default=[1, 10, 100, 500])
+    session_memory.add_argument('--timeout', type=float, default=120)
+    session_memory.add_argument('--faq-file', default='mf_faq_data.json')
+    session_memory.add_argument('--output', default='session_memory_report.md')
+    session_memory.set_defaults(func=benchmark_session_memory)
+
+    payload = subparsers.add_parser('payload', help="Server time and websocket bytes per Streamlit interaction")
+    payload.add_argument('--apps', nargs='+', default=['streamlit_app.py'],
+                         help="App scripts to compare, e.g. an older streamlit_app.py saved with git show")
+    payload.add_argument('--questions', type=int, default=20)
+    payload.add_argument('--timeout', type=float, default=180)
+    payload.add_argument('--faq-file', default='mf_faq_data.json')
+    payload.add_argument('--output', default='payload_report.md')
+    payload.set_defaults(func=benchmark_payload)
+
+    snapshot = subparsers.add_parser('snapshot', help="Knowledge-base load time and RSS, JSON vs binary snapshot")
+    snapshot.add_argument('--size', type=int, default=1000000)
+    snapshot.add_argument('--faq-file', default='mf_faq_data.json')
+    snapshot.add_argument('--output', default='snapshot_report.md')
+    snapshot.set_defaults(func=benchmark_snapshot)
+
+    entry_memory = subparsers.add_parser('entry-memory', help="Bytes per loaded knowledge-base entry")
+    entry_memory.add_argument('--size', type=int, default=100000)
+    entry_memory.add_argument('--faq-file', default='mf_faq_data.json')
+    entry_memory.add_argument('--output', default='entry_memory_report.md')
+    entry_memory.set_defaults(func=benchmark_entry_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import time
+from knowledge_store import KnowledgeStore, has_changes
+from vector_db import (VectorDB, ARTIFACT_DIR, DEFAULT_INDEX_PARAMS, STORAGE_TYPES, artifact_is_current,
+                       current_artifact_dir, is_store_path, kb_fingerprint, kb_source, prune_artifacts)
+
+def reusable_artifact(kb_path, artifact_root, index_kind, storage):
+    """
+    Live artifact that the next one can be built from by applying the
+    knowledge store's journal: built from the same store, with the same
+    index settings. None if there is no such artifact.
+    """
+    artifact_dir = current_artifact_dir(artifact_root)
+    if artifact_dir is None or not is_store_path(kb_path):
+        return None
+    with open(os.path.join(artifact_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('kb_seq') is None or (manifest.get('index_kind'), manifest.get('storage')) != (index_kind, storage):
+        return None
+    if manifest.get('kb_store_id') != kb_fingerprint(kb_path)['kb_store_id']:
+        return None
+    return artifact_dir
+
+def build_artifact(kb_path=None, artifact_root=ARTIFACT_DIR,
+                   index_kind='flat', storage='float32', keep=3):
+    """
+    Build a versioned index artifact from the knowledge store (or the FAQ
+    file if there is no store yet) and make it the live one. When the live
+    artifact came from the same store, it is extended with just the
+    entries changed since, instead of being rebuilt.
+    """
+    kb_path = kb_path or kb_source()
+    start = time.perf_counter()
+    db = VectorDB(index_kind=index_kind, storage=storage)
+    previous = reusable_artifact(kb_path, artifact_root, index_kind, storage)
+    if previous:
+        try:
+            db.load_artifact(previous, mmap=False)
+        except ValueError as e:
+            print(f"Not extending {previous}: {e}")
+            previous = None
+    if previous:
+        # The previous artifact's threshold may predate a recalibration
+        db.reload_metadata()
+        with KnowledgeStore(kb_path, read_only=True) as store:
+            db.sync_store(store)
+    else:
+        # Only new questions are encoded; the rest come from the embedding cache
+        db.load_kb(kb_path)
+    artifact_dir = db.save_artifact(kb_path, artifact_root, build_started=start)
+    prune_artifacts(artifact_root, keep)
+    print(f"Built index artifact {artifact_dir} with {len(db.entries)} entries in {time.perf_counter() - start:.2f}s")
+    return artifact_dir
+
+def update_artifact(diff, kb_path=None, artifact_root=ARTIFACT_DIR, **options):
+    """
+    Rebuild the artifact after a knowledge-store merge (diff from
+    KnowledgeStore.merge, or None if unknown). A merge that changed
+    nothing skips the build while the live artifact is still current.
+    """
+    kb_path = kb_path or kb_source()
+    artifact_dir = current_artifact_dir(artifact_root)
+    if diff is not None and not has_changes(diff) and artifact_dir and artifact_is_current(artifact_dir, kb_path):
+        with open(os.path.join(artifact_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            build_seconds = json.load(f).get('build_seconds')
+        saved = f"saved about {build_seconds:.2f}s, the last build's time" if build_seconds else "nothing to re-encode"
+        print(f"Knowledge base unchanged; skipped rebuilding {artifact_dir} ({saved})")
+        return artifact_dir
+    return build_artifact(kb_path, artifact_root, **options)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAQ vector index artifact")
+    parser.add_argument('--kb', default=None, help="Knowledge store (.db) or FAQ JSON file (default: the store if it exists)")
+    parser.add_argument('--output', default=ARTIFACT_DIR)
+    parser.add_argument('--index-kind', choices=list(DEFAULT_INDEX_PARAMS), default='flat')
+    parser.add_argument('--storage', choices=STORAGE_TYPES, default='float32')
+    parser.add_argument('--keep', type=int, default=3, help="Number of artifact versions to keep")
+    args = parser.parse_args()
+    build_artifact(args.kb, args.output, args.index_kind, args.storage, args.keep)
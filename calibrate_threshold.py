@@ -0,0 +1,56 @@
+from vector_db import VectorDB, kb_source
+
+# Paraphrased questions and the stored FAQ question they should match
+POSITIVE_QUERIES = [
+    ("expense ratio of icici elss tax saver", "What is the expense ratio of ICICI Prudential ELSS Tax Saver Fund?"),
+    ("How much is the TER for ICICI Prudential ELSS Tax Saver Fund?", "What is the expense ratio of ICICI Prudential ELSS Tax Saver Fund?"),
+    ("what's the lock in for the ICICI ELSS fund", "What is the lock-in period for ICICI Prudential ELSS Tax Saver Fund?"),
+    ("current NAV of ICICI Prudential Large Cap Fund", "What is the NAV of ICICI Prudential Large Cap Fund?"),
+    ("Is there an exit load on ICICI Large Cap Fund?", "What is the exit load for ICICI Prudential Large Cap Fund?"),
+    ("who manages ICICI Prudential ELSS Tax Saver Fund", "Who is the fund manager of ICICI Prudential ELSS Tax Saver Fund?"),
+    ("top stocks held by ICICI Prudential Large Cap Fund", "What are the top holdings of ICICI Prudential Large Cap Fund?"),
+    ("riskometer of ICICI Multi-Asset Fund", "What is the riskometer rating for ICICI Prudential Multi-Asset Fund?"),
+    ("benchmark index of ICICI Prudential Bluechip Fund", "What is the benchmark for ICICI Prudential Bluechip Fund?"),
+    ("minimum amount to invest in ICICI Focused Equity Fund", "What is the minimum investment amount for ICICI Prudential Focused Equity Fund?"),
+    ("smallest SIP allowed in ICICI Prudential schemes", "What is the minimum SIP amount for ICICI Prudential schemes?"),
+    ("how do I get my capital gains statement from ICICI Prudential", "How to download capital gains statement from ICICI Prudential?"),
+    ("what does exit load mean", "What is exit load in mutual funds?"),
+    ("explain expense ratio", "What is expense ratio in mutual funds?"),
+    ("what is NAV", "What is Net Asset Value (NAV) in mutual funds?"),
+    ("SIP vs lump sum", "What is the difference between SIP and lump sum investment?"),
+    ("direct plan vs regular plan difference", "What is the difference between regular plan and direct plan?"),
+    ("growth vs IDCW option", "What is the difference between growth option and dividend option?"),
+    ("types of mutual fund schemes", "What are the different types of mutual funds?"),
+    ("portfolio turnover of ICICI Prudential Bluechip Fund", "What is the portfolio turnover ratio for ICICI Prudential Bluechip Fund?"),
+]
+
+# Questions the knowledge base cannot answer; these should fall through
+NEGATIVE_QUERIES = [
+    "What is the weather in Mumbai today?",
+    "How do I open a savings bank account?",
+    "What is the NAV of SBI Small Cap Fund?",
+    "Who won the cricket match yesterday?",
+    "How do I file my income tax return?",
+    "What is the current repo rate?",
+    "Tell me a joke",
+    "What is the price of gold today?",
+    "How to apply for a credit card?",
+    "What is the expense ratio of HDFC Flexi Cap Fund?",
+]
+
+def calibrate(kb_path=None):
+    """Tune the vector match threshold offline and store it with the index metadata"""
+    db = VectorDB()
+    db.load_kb(kb_path or kb_source())
+    
+    labelled = POSITIVE_QUERIES + [(query, None) for query in NEGATIVE_QUERIES]
+    threshold = db.calibrate_threshold(labelled)
+    db.save_metadata()
+    
+    print(f"Calibrated {db.metric} match threshold: {threshold:.4f}")
+    print(f"Decision accuracy on {db.metadata['calibration_samples']} labelled queries: {db.metadata['calibration_accuracy']:.1%}")
+    print(f"Saved index metadata to {db.metadata_path}")
+    return threshold
+
+if __name__ == "__main__":
+    calibrate()
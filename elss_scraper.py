@@ -1,11 +1,17 @@
 import requests
 from bs4 import BeautifulSoup
 import re
-import json
 import os
+import sys
+from knowledge_store import KNOWLEDGE_DB_PATH, KnowledgeStore, diff_summary, merge_scraped_entries
+from text_utils import entry_id
 
 def scrape_icici_elss_tax_saver_fund_data():
-    """Scrape detailed data from ICICI Prudential ELSS Tax Saver Fund page"""
+    """
+    Scrape detailed data from ICICI Prudential ELSS Tax Saver Fund page.
+    Returns (entries, scraped): scraped is False when the page could not
+    be read and the entries are the built-in fallback ones.
+    """
     url = 'https://www.icicidirect.com/mutual-funds/nav-details/icici-pru-elss-tax-saver-fund-g'
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -573,7 +579,7 @@ def scrape_icici_elss_tax_saver_fund_data():
                 "source": url
             })
         
-        return faq_entries
+        return faq_entries, True
         
     except Exception as e:
         print(f"Error scraping data: {e}")
@@ -589,60 +595,53 @@ def scrape_icici_elss_tax_saver_fund_data():
                 "answer": "ICICI Prudential ELSS Tax Saver Fund does not charge any exit load since it has a mandatory lock-in period of 3 years as prescribed by the Income Tax Act.",
                 "source": url
             }
-        ]
+        ], False
 
 def update_elss_faq_data():
     """Update the FAQ data with scraped information for ELSS fund"""
     # Check current working directory
     print(f"Current working directory: {os.getcwd()}")
     
-    # Get existing data
-    try:
-        with open('mf_faq_data.json', 'r') as f:
-            existing_data = json.load(f)
-        print(f"Loaded existing data with {len(existing_data)} entries")
-    except FileNotFoundError:
-        existing_data = []
-        print("No existing data file found, creating new one")
-    except Exception as e:
-        print(f"Error loading existing data: {e}")
-        existing_data = []
-    
     # Scrape new data
-    new_entries = scrape_icici_elss_tax_saver_fund_data()
+    new_entries, scraped = scrape_icici_elss_tax_saver_fund_data()
     print(f"Scraped {len(new_entries)} new entries")
     
-    # Merge data (new entries take precedence)
-    merged_data = new_entries.copy()
-    
-    # Add existing entries that don't conflict
-    existing_questions = {entry['question'].lower() for entry in new_entries}
-    for entry in existing_data:
-        if entry['question'].lower() not in existing_questions:
-            merged_data.append(entry)
-    
-    # Save updated data
+    # Merge into the knowledge store: new entries replace the ones with the
+    # same question, and after a successful scrape entries from this page
+    # that were not scraped again are removed; other sources are kept. The
+    # fallback entries only cover part of the page, so they never prune.
+    # Only entries whose content hash changed are journaled, so concurrent
+    # scraper runs do not lose each other's updates and an unchanged scrape
+    # writes nothing.
+    if not scraped:
+        print("Page could not be scraped; merging the fallback entries without removing any")
     try:
-        with open('mf_faq_data.json', 'w') as f:
-            json.dump(merged_data, f, indent=2)
-        print(f"Successfully updated FAQ data with {len(new_entries)} new entries")
+        diff = merge_scraped_entries(new_entries, prune_sources=scraped)
+        print(f"Merged {len(new_entries)} scraped entries: {diff_summary(diff)}")
+        updated = set(diff['added'] + diff['changed'])
         for entry in new_entries:
-            print(f"  - {entry['question']}")
+            if entry_id(entry['question']) in updated:
+                print(f"  - {entry['question']}")
+        with KnowledgeStore(KNOWLEDGE_DB_PATH, read_only=True) as store:
+            total = store.count()
     except Exception as e:
         print(f"Error saving data: {e}")
+        diff, total = None, 0
     
-    # Reload vector database to update embeddings
+    # Rebuild the index artifact that serving processes load, unless nothing changed
     try:
-        from vector_db import initialize_vector_db
-        vector_db = initialize_vector_db()
-        vector_db.load_faq_data('mf_faq_data.json')
-        print("Vector database reloaded with updated FAQ data")
+        from build_index import update_artifact
+        update_artifact(diff)
     except Exception as e:
-        print(f"Error reloading vector database: {e}")
+        print(f"Error rebuilding index artifact: {e}")
     
-    print(f"Total FAQ entries: {len(merged_data)}")
-    return merged_data
+    print(f"Total FAQ entries: {total}")
+    return diff, scraped
 
 if __name__ == "__main__":
-    updated_data = update_elss_faq_data()
-    print(f"Total FAQ entries: {len(updated_data)}")
\ No newline at end of file
+    diff, scraped = update_elss_faq_data()
+    if diff is not None:
+        print(f"Knowledge store: {diff_summary(diff)}")
+    # A non-zero exit makes the scheduler report the failed update
+    if diff is None or not scraped:
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+# Encoder backend selection: 'torch' (SentenceTransformer) or 'onnx'
+ENCODER_BACKEND = os.environ.get('MF_ENCODER_BACKEND', 'torch')
+# Directory written by `python encoders.py`
+ONNX_MODEL_DIR = os.environ.get('MF_ONNX_MODEL_DIR', 'onnx_model')
+# Use the int8 dynamically quantized graph when it exists
+ONNX_QUANTIZED = os.environ.get('MF_ONNX_QUANTIZED', '1') == '1'
+# Lowest cosine similarity to the PyTorch encoder, over the FAQ questions,
+# that an exported graph may show; load_encoder refuses graphs below it
+MIN_ONNX_COSINE = 0.99
+# Questions the export is checked against
+VERIFY_FAQ_FILE = 'mf_faq_data.json'
+# Graph files written by export_onnx
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_QUANTIZED_MODEL_FILE = 'model_quantized.onnx'
+
+def read_onnx_config(model_dir=ONNX_MODEL_DIR):
+    """encoder_config.json written by export_onnx"""
+    with open(os.path.join(model_dir, 'encoder_config.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def onnx_model_file(config, quantized=ONNX_QUANTIZED):
+    """Graph file to load from an export: the int8 copy only if requested and exported"""
+    return ONNX_QUANTIZED_MODEL_FILE if quantized and config.get('quantized') else ONNX_MODEL_FILE
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an exported transformer through ONNX Runtime.
+    Reproduces the SentenceTransformer pipeline for MiniLM models
+    (mean pooling over the attention mask, then L2 normalization) and
+    exposes the same encode / get_sentence_embedding_dimension calls.
+    """
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.config = read_onnx_config(model_dir)
+        self.model_file = onnx_model_file(self.config, quantized)
+        self.model_path = os.path.join(model_dir, self.model_file)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(self.config['max_length'])
+        self.tokenizer.enable_padding()
+
+    def get_sentence_embedding_dimension(self):
+        """Size of the embeddings produced by encode"""
+        return self.config['dimension']
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Encode a list of sentences into normalized float32 embeddings"""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            encodings = self.tokenizer.encode_batch(list(sentences[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype='int64')
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype='int64')
+            feed = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.input_names:
+                feed['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype='int64')
+            token_embeddings = self.session.run(None, feed)[0]
+
+            mask = attention_mask[:, :, None].astype('float32')
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype('float32'))
+        if not outputs:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype='float32')
+        return np.concatenate(outputs)
+
+def encoder_name(model_name, backend=ENCODER_BACKEND, model_dir=ONNX_MODEL_DIR):
+    """
+    Identifier for cached embeddings; ONNX vectors are cached separately,
+    and int8 ones only when the export has the quantized graph that
+    OnnxEncoder will load
+    """
+    if backend == 'onnx':
+        try:
+            model_file = onnx_model_file(read_onnx_config(model_dir))
+        except FileNotFoundError:
+            # Not exported yet; load_encoder will fail before anything is cached
+            model_file = ONNX_MODEL_FILE
+        return f"{model_name}+onnx{'-int8' if model_file == ONNX_QUANTIZED_MODEL_FILE else ''}"
+    return model_name
+
+def load_encoder(model_name, backend=ENCODER_BACKEND):
+    """Create the configured sentence encoder for a model"""
+    if backend == 'onnx':
+        encoder = OnnxEncoder()
+        if encoder.config['model_name'] != model_name:
+            raise ValueError(f"ONNX model in {ONNX_MODEL_DIR} was exported from {encoder.config['model_name']}, not {model_name}")
+        # Only serve a graph verified against the PyTorch encoder
+        agreement = encoder.config.get('min_cosine', {}).get(encoder.model_file)
+        if agreement is None or agreement < MIN_ONNX_COSINE:
+            raise ValueError(f"{encoder.model_path} has not passed verification (min cosine {agreement}, "
+                             f"needs {MIN_ONNX_COSINE}); run python encoders.py --verify-only")
+        return encoder
+    if backend != 'torch':
+        raise ValueError(f"Unsupported encoder backend: {backend}")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+def export_onnx(model_name='all-MiniLM-L6-v2', output_dir=ONNX_MODEL_DIR, quantize=True, max_length=256):
+    """Export the SentenceTransformer's transformer to ONNX, optionally with an int8 copy"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    os.makedirs(output_dir, exist_ok=True)
+
+    sample = tokenizer(["What is the expense ratio?"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['token_embeddings'] = {0: 'batch', 1: 'sequence'}
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    config = {
+        'model_name': model_name,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_length': min(max_length, model.max_seq_length),
+        'quantized': quantize
+    }
+    with open(os.path.join(output_dir, 'encoder_config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    print(f"Exported {model_name} to {output_dir} ({'with' if quantize else 'without'} int8 quantized copy)")
+    return verify_onnx(output_dir)
+
+def verify_onnx(model_dir=ONNX_MODEL_DIR, faq_file_path=VERIFY_FAQ_FILE, min_cosine=MIN_ONNX_COSINE):
+    """
+    Compare every exported graph with the PyTorch encoder on the FAQ
+    questions (and lowercased variants) and record each graph's minimum
+    cosine in encoder_config.json, where load_encoder checks it.
+    Returns whether every graph reached min_cosine.
+    """
+    import numpy as np
+    config = read_onnx_config(model_dir)
+    with open(faq_file_path, 'r', encoding='utf-8') as f:
+        questions = [entry['question'] for entry in json.load(f)]
+    sentences = questions + [question.lower().rstrip('?') for question in questions]
+    reference = load_encoder(config['model_name'], backend='torch')
+    reference_vectors = np.asarray(reference.encode(sentences, normalize_embeddings=True), dtype='float32')
+
+    config['min_cosine'] = {}
+    passed = True
+    for quantized in (False, True):
+        if quantized and not config.get('quantized'):
+            continue
+        encoder = OnnxEncoder(model_dir, quantized=quantized)
+        agreement = float((encoder.encode(sentences) * reference_vectors).sum(axis=1).min())
+        config['min_cosine'][encoder.model_file] = agreement
+        ok = agreement >= min_cosine
+        passed = passed and ok
+        print(f"{encoder.model_file}: min cosine {agreement:.4f} vs PyTorch over {len(sentences)} sentences "
+              f"({'ok' if ok else f'FAIL, below {min_cosine}'})")
+    with open(os.path.join(model_dir, 'encoder_config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the sentence encoder to ONNX")
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--output', default=ONNX_MODEL_DIR)
+    parser.add_argument('--no-quantize', action='store_true')
+    parser.add_argument('--verify-only', action='store_true', help="Re-check an existing export against PyTorch")
+    args = parser.parse_args()
+    if args.verify_only:
+        passed = verify_onnx(args.output)
+    else:
+        passed = export_onnx(args.model, args.output, quantize=not args.no_quantize)
+    # Non-zero exit, so a failing export can gate deployment of the ONNX backend
+    if not passed:
+        sys.exit(1)
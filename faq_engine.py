@@ -0,0 +1,95 @@
+from vector_db import exact_match_db, get_vector_db_if_ready, hybrid_search_similar_questions, initialize_vector_db
+from opinion_filter import find_opinion_phrase, refusal_response
+from text_utils import normalize_query
+
+def find_relevant_faq(question):
+    """Find the most relevant FAQ entry for a given question using RAG"""
+    # Check for opinionated/portfolio questions and refuse politely
+    # (one automaton pass over the question, see opinionated_phrases.txt)
+    if find_opinion_phrase(question):
+        return refusal_response(question)
+
+    # Verbatim FAQ questions are answered without running the encoder,
+    # even while the first index is still encoding its questions
+    try:
+        exact_match = exact_match_db().get_exact(question)
+        if exact_match:
+            return exact_match
+    except Exception as e:
+        print(f"Error in exact-match lookup: {e}")
+
+    # Hybrid BM25 + vector retrieval; a confident vector hit (calibrated
+    # threshold in the index metadata) ranks first, lexical matches fill in
+    try:
+        results = hybrid_search_similar_questions(question, k=1)
+        if results:
+            return results[0]
+    except Exception as e:
+        print(f"Error in hybrid search: {e}")
+        # Lexical ranking still works without the encoder
+        results = initialize_vector_db().lexical_search(question, k=1)
+        if results:
+            return results[0]
+
+    # Nothing indexed matched; return the first entry
+    db = initialize_vector_db()
+    if not db.entries:
+        return {"error": "No data available"}
+    return db.get_entry(next(iter(db.entries)))
+
+def find_relevant_faq_batch(questions):
+    """
+    find_relevant_faq for many questions at once. Returns (result, stage)
+    pairs in input order, where stage is 'refusal', 'exact', 'hybrid',
+    'lexical' or 'fallback'. Questions that normalize to the same text are
+    searched once, and all remaining searches share one encoder call.
+    """
+    db = initialize_vector_db()
+    answers = [None] * len(questions)
+    # Normalized question -> positions still waiting for a search
+    pending = {}
+    for n, question in enumerate(questions):
+        if find_opinion_phrase(question):
+            answers[n] = (refusal_response(question), 'refusal')
+            continue
+        exact_match = db.get_exact(question)
+        if exact_match:
+            answers[n] = (exact_match, 'exact')
+            continue
+        pending.setdefault(normalize_query(question), []).append(n)
+
+    if pending:
+        unique = [questions[positions[0]] for positions in pending.values()]
+        try:
+            searched = [(results, 'hybrid') for results in db.hybrid_search_batch(unique, k=1)]
+        except Exception as e:
+            print(f"Error in hybrid search: {e}")
+            searched = [(db.lexical_search(question, k=1), 'lexical') for question in unique]
+        fallback = db.get_entry(next(iter(db.entries))) if db.entries else {"error": "No data available"}
+        for positions, (results, stage) in zip(pending.values(), searched):
+            answer = (results[0], stage) if results else (fallback, 'fallback')
+            for n in positions:
+                answers[n] = answer
+    return answers
+
+def resolve_answer(question, entry_id):
+    """
+    Result for a stored (question, entry ID) pair, looked up in the index
+    being served. Refusals have no entry ID; an entry removed by a later
+    knowledge-base update is answered again.
+    """
+    if entry_id is not None:
+        result = initialize_vector_db().get_entry(entry_id)
+        if result is not None:
+            return result
+    return find_relevant_faq(question)
+
+def kb_version():
+    """
+    Version of the knowledge base currently being served, for keying
+    caches of answers; None until the index has loaded
+    """
+    db = get_vector_db_if_ready()
+    if db is None:
+        return None
+    return (db.generation, db.revision)
@@ -0,0 +1,128 @@
+import sys
+import threading
+from scheme_router import SchemeRouter
+from text_utils import content_hash, entry_id
+
+# Entries that name no particular metric (general concepts, comparisons)
+OTHER_METRIC = 'other'
+
+# Metric keys and the phrases that ask for them in a question
+METRIC_PHRASES = {
+    'nav': ['nav', 'net asset value'],
+    'exit-load': ['exit load'],
+    'aum': ['aum', 'assets under management'],
+    'expense-ratio': ['expense ratio'],
+    'sharpe-ratio': ['sharpe ratio'],
+    'beta': ['beta ratio', 'beta'],
+    'fund-manager': ['fund manager'],
+    'inception-date': ['inception date'],
+    'minimum-investment': ['minimum investment'],
+    'sip': ['sip'],
+    'investment-objective': ['investment objective'],
+    'risk': ['risk level', 'riskometer'],
+    'holdings': ['holdings'],
+    'lock-in': ['lock in'],
+    'asset-allocation': ['asset allocation'],
+    'returns': ['returns'],
+    'sectors': ['sectors'],
+    'scheme-details': ['scheme details'],
+    'contact': ['contact information', 'contact'],
+    'benchmark': ['benchmark'],
+    'dividend-yield': ['dividend yield'],
+    'portfolio-turnover': ['portfolio turnover'],
+    'capital-gains': ['capital gains'],
+    'fund-type': ['type of fund', 'types of mutual funds']
+}
+
+_scheme_router = SchemeRouter()
+_metric_router = SchemeRouter(METRIC_PHRASES)
+
+def scheme_for(question):
+    """Scheme an FAQ question is about: the first one it names, else 'general'"""
+    return sys.intern(_scheme_router.shard_for(question))
+
+def metric_for(question):
+    """Metric an FAQ question asks about: the first one it names, else 'other'"""
+    metrics = _metric_router.route(question)
+    return sys.intern(metrics[0]) if metrics else OTHER_METRIC
+
+class SourceTable:
+    """
+    Distinct answer source URLs, each held once.
+    Entries refer to their source by position, since dozens of entries
+    share the same fund page.
+    """
+    def __init__(self):
+        self.urls = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.urls)
+
+    def intern(self, url):
+        """Source ID of a URL, adding it on first sight"""
+        source_id = self._ids.get(url)
+        if source_id is None:
+            with self._lock:
+                source_id = self._ids.get(url)
+                if source_id is None:
+                    source_id = len(self.urls)
+                    self.urls.append(url)
+                    self._ids[url] = source_id
+        return source_id
+
+    def url(self, source_id):
+        """URL of a source ID"""
+        return self.urls[source_id]
+
+# Process-wide source table shared by every loaded entry
+SOURCES = SourceTable()
+
+class FAQEntry:
+    """
+    One knowledge-base entry.
+    Slots instead of a dict, the source as an ID into SOURCES and interned
+    scheme and metric keys, so an entry costs little beyond its question
+    and answer text. content_hash identifies the exact text, so merges can
+    tell changed entries apart without comparing answers.
+    """
+    __slots__ = ('id', 'question', '_answer', 'source_id', 'scheme', 'metric', 'content_hash')
+
+    def __init__(self, idx, question, answer, source_id, scheme, metric, content_hash):
+        self.id = idx
+        self.question = question
+        self._answer = answer
+        self.source_id = source_id
+        self.scheme = scheme
+        self.metric = metric
+        self.content_hash = content_hash
+
+    @classmethod
+    def create(cls, question, answer, source):
+        """Entry for a question; its ID, scheme, metric and hash follow from the text"""
+        return cls(entry_id(question), question, answer, SOURCES.intern(source),
+                   scheme_for(question), metric_for(question), content_hash(question, answer, source))
+
+    @property
+    def answer(self):
+        """Answer text"""
+        return self._answer
+
+    @property
+    def source(self):
+        """Source URL"""
+        return SOURCES.url(self.source_id)
+
+    def to_dict(self):
+        """The entry as stored in the JSON knowledge base"""
+        return {'question': self.question, 'answer': self.answer, 'source': self.source}
+
+    def __repr__(self):
+        return f"FAQEntry(id={self.id}, question={self.question!r}, source={self.source!r})"
+
+def as_entry(entry):
+    """FAQEntry for an entry dict (question, answer, source); entries pass through"""
+    if isinstance(entry, FAQEntry):
+        return entry
+    return FAQEntry.create(entry['question'], entry['answer'], entry['source'])
@@ -0,0 +1,177 @@
+import mmap
+import struct
+import sys
+from array import array
+from faq_entry import FAQEntry, SOURCES
+
+# File signature and layout version of knowledge-base snapshots
+SNAPSHOT_MAGIC = b'MFKS'
+SNAPSHOT_FORMAT_VERSION = 3
+
+# Entry fields with few distinct values, stored once each and referenced by number
+INTERNED_FIELDS = ('source', 'scheme', 'metric')
+
+# magic, version, entries, byte sizes of the question and answer pools,
+# then for each interned field its number of values and pool size
+HEADER = struct.Struct('<4sIIQQ' + 'IQ' * len(INTERNED_FIELDS))
+
+# The offset tables are stored little-endian
+_SWAP_BYTES = sys.byteorder != 'little'
+
+def _string_pool(strings):
+    """UTF-8 pool of strings plus the end offset of each one"""
+    encoded = [s.encode('utf-8') for s in strings]
+    ends = array('Q')
+    end = 0
+    for data in encoded:
+        end += len(data)
+        ends.append(end)
+    return b''.join(encoded), ends
+
+def write_snapshot(path, entries):
+    """
+    Write FAQEntry objects to a snapshot file.
+
+    Layout after the header: entry IDs and content hashes (int64), the end
+    offsets of each question and answer in its pool (uint64), then for
+    each interned field the end offsets of its distinct values (uint64)
+    and each entry's value number (uint32), then the question, answer and
+    interned value pools.
+    Returns the number of entries written.
+    """
+    ids, hashes = array('q'), array('q')
+    questions, answers = [], []
+    # Field -> value -> number, and field -> each entry's number
+    numbers = {field: {} for field in INTERNED_FIELDS}
+    refs = {field: array('I') for field in INTERNED_FIELDS}
+    for entry in entries:
+        ids.append(entry.id)
+        hashes.append(entry.content_hash)
+        questions.append(entry.question)
+        answers.append(entry.answer)
+        for field in INTERNED_FIELDS:
+            values = numbers[field]
+            refs[field].append(values.setdefault(getattr(entry, field), len(values)))
+    question_pool, question_ends = _string_pool(questions)
+    answer_pool, answer_ends = _string_pool(answers)
+    value_pools = [_string_pool(numbers[field]) for field in INTERNED_FIELDS]
+
+    header = [SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, len(ids), len(question_pool), len(answer_pool)]
+    for field, (pool, _) in zip(INTERNED_FIELDS, value_pools):
+        header += [len(numbers[field]), len(pool)]
+    tables = [ids, hashes, question_ends, answer_ends]
+    for field, (_, ends) in zip(INTERNED_FIELDS, value_pools):
+        tables += [ends, refs[field]]
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(*header))
+        for table in tables:
+            if _SWAP_BYTES:
+                table.byteswap()
+            table.tofile(f)
+        f.write(question_pool)
+        f.write(answer_pool)
+        for pool, _ in value_pools:
+            f.write(pool)
+    return len(ids)
+
+class KBSnapshot:
+    """
+    Read-only knowledge-base snapshot, memory-mapped.
+    IDs, questions, sources, schemes and metrics are decoded when it is
+    opened, since every index needs them; answers, which include
+    multi-kilobyte holdings tables, stay in the mapped file until an
+    entry is actually displayed.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mm, 0)
+        magic, version, count, question_bytes, answer_bytes = header[:5]
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {SNAPSHOT_FORMAT_VERSION} knowledge-base snapshot")
+        interned = list(zip(INTERNED_FIELDS, header[5::2], header[6::2]))
+        pos = HEADER.size
+
+        def read_table(typecode, length):
+            nonlocal pos
+            table = array(typecode)
+            end = pos + length * table.itemsize
+            table.frombytes(self._mm[pos:end])
+            if _SWAP_BYTES:
+                table.byteswap()
+            pos = end
+            return table
+
+        self.ids = read_table('q', count)
+        self.content_hashes = read_table('q', count)
+        question_ends = read_table('Q', count)
+        self._answer_ends = read_table('Q', count)
+        value_ends, self.refs = {}, {}
+        for field, value_count, _ in interned:
+            value_ends[field] = read_table('Q', value_count)
+            self.refs[field] = read_table('I', count)
+        self.questions = _decode_pool(self._mm[pos:pos + question_bytes], question_ends)
+        self._answers_at = pos + question_bytes
+        pos = self._answers_at + answer_bytes
+        # Field -> its distinct values, by number
+        self.values = {}
+        for field, _, pool_bytes in interned:
+            self.values[field] = [sys.intern(value) for value in
+                                  _decode_pool(self._mm[pos:pos + pool_bytes], value_ends[field])]
+            pos += pool_bytes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap the file; answers can no longer be read"""
+        self._mm.close()
+
+    def answer(self, row):
+        """Answer of the entry in a row, read from the mapped file"""
+        start = self._answer_ends[row - 1] if row else 0
+        return self._mm[self._answers_at + start:self._answers_at + self._answer_ends[row]].decode('utf-8')
+
+    def entries(self):
+        """Entry ID -> entry for every row, with answers read on access"""
+        source_ids = [SOURCES.intern(url) for url in self.values['source']]
+        schemes, metrics = self.values['scheme'], self.values['metric']
+        source_refs, scheme_refs, metric_refs = self.refs['source'], self.refs['scheme'], self.refs['metric']
+        return {
+            idx: SnapshotEntry(self, row, idx, self.questions[row], source_ids[source_refs[row]],
+                               schemes[scheme_refs[row]], metrics[metric_refs[row]], self.content_hashes[row])
+            for row, idx in enumerate(self.ids)
+        }
+
+def _decode_pool(pool, ends):
+    """Strings of a UTF-8 pool, given the end offset of each"""
+    strings = []
+    start = 0
+    for end in ends:
+        strings.append(pool[start:end].decode('utf-8'))
+        start = end
+    return strings
+
+class SnapshotEntry(FAQEntry):
+    """
+    FAQEntry whose answer is read from its snapshot each time it is used
+    """
+    __slots__ = ('snapshot', 'row')
+
+    def __init__(self, snapshot, row, idx, question, source_id, scheme, metric, content_hash):
+        super().__init__(idx, question, None, source_id, scheme, metric, content_hash)
+        self.snapshot = snapshot
+        self.row = row
+
+    @property
+    def answer(self):
+        """Answer text, read from the snapshot"""
+        return self.snapshot.answer(self.row)
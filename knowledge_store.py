@@ -0,0 +1,466 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import urllib.parse
+import uuid
+from contextlib import contextmanager
+from faq_entry import FAQEntry, SOURCES, as_entry
+from text_utils import entry_id, normalize_question
+
+# SQLite database holding the FAQ knowledge base
+KNOWLEDGE_DB_PATH = os.environ.get('MF_KNOWLEDGE_DB', 'mf_knowledge.db')
+# JSON knowledge base imported into a new store, and the default export target
+FAQ_JSON_PATH = 'mf_faq_data.json'
+
+# Kinds of entry in a merge diff, in report order
+DIFF_KINDS = ('added', 'changed', 'removed', 'unchanged')
+
+# Journal records after which merge_scraped_entries folds the journal into
+# a new snapshot
+COMPACT_AFTER = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS faq_entries (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    normalized_question TEXT NOT NULL UNIQUE,
+    answer TEXT NOT NULL,
+    source TEXT NOT NULL,
+    scheme TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    content_hash INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS faq_entries_seq ON faq_entries (seq);
+CREATE INDEX IF NOT EXISTS faq_entries_scheme ON faq_entries (scheme);
+CREATE INDEX IF NOT EXISTS faq_entries_metric ON faq_entries (metric);
+CREATE INDEX IF NOT EXISTS faq_entries_source ON faq_entries (source);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faq_journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    op TEXT NOT NULL CHECK (op IN ('upsert', 'delete')),
+    id INTEGER NOT NULL,
+    question TEXT,
+    answer TEXT,
+    source TEXT,
+    scheme TEXT,
+    metric TEXT,
+    content_hash INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS faq_journal_id ON faq_journal (id, seq);
+-- The knowledge base as readers see it: the faq_entries snapshot with the
+-- latest journal record for each ID applied on top. Entries added since
+-- the snapshot sort after it, in journal order.
+CREATE VIEW IF NOT EXISTS faq_current AS
+WITH latest AS (
+    SELECT * FROM faq_journal WHERE seq IN (SELECT MAX(seq) FROM faq_journal GROUP BY id)
+)
+SELECT seq AS pos, id, question, answer, source, scheme, metric, content_hash
+FROM faq_entries WHERE id NOT IN (SELECT id FROM latest)
+UNION ALL
+SELECT COALESCE(e.seq, (SELECT COALESCE(MAX(seq), 0) FROM faq_entries) + l.seq) AS pos,
+       l.id, l.question, l.answer, l.source, l.scheme, l.metric, l.content_hash
+FROM latest l LEFT JOIN faq_entries e ON e.id = l.id
+WHERE l.op = 'upsert';
+"""
+
+# Insert a new entry at the end, or update an existing one in place when
+# its content differs; an unchanged entry is not rewritten
+UPSERT_SQL = """
+INSERT INTO faq_entries (id, seq, question, normalized_question, answer, source, scheme, metric, content_hash, updated_at)
+VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM faq_entries), ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    question = excluded.question,
+    answer = excluded.answer,
+    source = excluded.source,
+    scheme = excluded.scheme,
+    metric = excluded.metric,
+    content_hash = excluded.content_hash,
+    updated_at = excluded.updated_at
+WHERE content_hash IS NOT excluded.content_hash
+"""
+
+JOURNAL_SQL = """
+INSERT INTO faq_journal (run_id, op, id, question, answer, source, scheme, metric, content_hash, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+ENTRY_COLUMNS = 'id, question, answer, source, scheme, metric, content_hash'
+
+class KnowledgeStore:
+    """
+    Transactional FAQ knowledge base in SQLite (WAL mode).
+    Entries are keyed by the same stable ID as the vector index. Writers
+    append upsert and delete records for what actually changed to an
+    append-only journal, tagged with a run ID, so an update costs what it
+    changes and concurrent scrapers never overwrite each other. Readers see
+    the last snapshot (faq_entries) with the journal applied on top, and
+    compact() folds the journal into a new snapshot. A revision counter,
+    bumped by every write that changes something, tells readers when to
+    reload; changes_since() tells them exactly which IDs changed.
+    """
+    def __init__(self, path=KNOWLEDGE_DB_PATH, timeout=30, read_only=False):
+        """
+        Open or create a store. read_only opens an existing store through a
+        read-only connection without any schema setup, so processes that
+        only poll or load it never take the write lock scrapers need.
+        """
+        self.path = path
+        if read_only:
+            uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, timeout=timeout, isolation_level=None, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            return
+        # Autocommit mode; writes open their own BEGIN IMMEDIATE transaction
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+        self.conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('revision', '0')")
+        # Last journal sequence number folded into faq_entries
+        self.conn.execute("INSERT OR IGNORE INTO store_meta (key, value) VALUES ('snapshot_seq', '0')")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database connection"""
+        self.conn.close()
+
+    def _meta(self, key):
+        row = self.conn.execute('SELECT value FROM store_meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    @property
+    def store_id(self):
+        """Random ID of this database, so artifacts can tell stores apart"""
+        return self._meta('store_id')
+
+    @property
+    def revision(self):
+        """Number of committed writes that changed the knowledge base"""
+        return int(self._meta('revision'))
+
+    @property
+    def snapshot_seq(self):
+        """Journal position the faq_entries snapshot was compacted at"""
+        return int(self._meta('snapshot_seq'))
+
+    @property
+    def journal_seq(self):
+        """Position of the newest journal record, including compacted ones"""
+        row = self.conn.execute('SELECT MAX(seq) FROM faq_journal').fetchone()
+        return max(row[0] or 0, self.snapshot_seq)
+
+    @contextmanager
+    def read_transaction(self):
+        """
+        Read a consistent view across several queries (e.g. paging through
+        iter_entries) while writers keep committing
+        """
+        if self.conn.in_transaction:
+            # Already inside one; its snapshot covers this read too
+            yield self
+            return
+        self.conn.execute('BEGIN')
+        try:
+            yield self
+        finally:
+            self.conn.execute('COMMIT')
+
+    def _write(self, apply):
+        """
+        Run apply(conn) in one immediate transaction and bump the revision
+        if it changed any rows. Returns the number of changed rows.
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            before = self.conn.total_changes
+            apply(self.conn)
+            changed = self.conn.total_changes - before
+            if changed:
+                self.conn.execute("UPDATE store_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return changed
+
+    def upsert(self, entries, run_id=None):
+        """
+        Insert or update FAQ entries (FAQEntry objects or dicts with
+        question, answer and source) by question.
+        Only entries that are new or differ from the current ones are
+        journaled. Returns the number of entries added or changed.
+        """
+        diff = self.merge(entries, run_id)
+        return len(diff['added']) + len(diff['changed'])
+
+    def merge(self, entries, run_id=None, prune_sources=False):
+        """
+        Upsert entries and report what that changed, by content hash, as a
+        diff of entry IDs: 'added', 'changed', 'removed' and 'unchanged'.
+        With prune_sources, stored entries from the same sources that are
+        not among the merged ones are removed, for a merge that re-scraped
+        those pages in full. A merge that changes nothing writes nothing.
+        """
+        run_id = run_id or new_run_id()
+        batch = {entry.id: entry for entry in map(as_entry, entries)}
+        with self.read_transaction():
+            diff, _ = self._diff(batch, prune_sources, run_id)
+        if not has_changes(diff):
+            return diff
+
+        def apply(conn):
+            # Diff again within the write transaction, so no concurrent run can slip in between
+            nonlocal diff
+            diff, rows = self._diff(batch, prune_sources, run_id)
+            conn.executemany(JOURNAL_SQL, rows)
+        self._write(apply)
+        return diff
+
+    def _diff(self, batch, prune_sources, run_id):
+        """Diff of a merge batch against the stored entries, plus its journal records"""
+        now = time.time()
+        stored = self.content_hashes(batch)
+        diff = {kind: [] for kind in DIFF_KINDS}
+        rows = []
+        for i, entry in batch.items():
+            if stored.get(i) == entry.content_hash:
+                diff['unchanged'].append(i)
+                continue
+            diff['changed' if i in stored else 'added'].append(i)
+            rows.append((run_id, 'upsert', i, entry.question, entry.answer, entry.source,
+                         entry.scheme, entry.metric, entry.content_hash, now))
+        if prune_sources and batch:
+            sources = list({entry.source for entry in batch.values()})
+            placeholders = ', '.join('?' * len(sources))
+            for (i,) in self.conn.execute(f'SELECT id FROM faq_current WHERE source IN ({placeholders})', sources):
+                if i not in batch:
+                    diff['removed'].append(i)
+                    rows.append((run_id, 'delete', i, None, None, None, None, None, None, now))
+        return diff, rows
+
+    def content_hashes(self, ids):
+        """Content hash of the stored entry for each of several IDs; missing IDs are left out"""
+        ids = list(ids)
+        hashes = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            hashes.update(self.conn.execute(
+                f'SELECT id, content_hash FROM faq_current WHERE id IN ({placeholders})', chunk
+            ).fetchall())
+        return hashes
+
+    def delete(self, ids, run_id=None):
+        """Delete entries by ID; returns the number removed"""
+        run_id = run_id or new_run_id()
+        now = time.time()
+
+        def apply(conn):
+            present = self.get_many(ids)
+            conn.executemany(JOURNAL_SQL, [(run_id, 'delete', i, None, None, None, None, None, None, now) for i in present])
+        return self._write(apply)
+
+    def get_many(self, ids):
+        """Current entries for several IDs, keyed by ID; missing IDs are left out"""
+        ids = list(ids)
+        current = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for row in self.conn.execute(f'SELECT {ENTRY_COLUMNS} FROM faq_current WHERE id IN ({placeholders})', chunk):
+                current[row['id']] = _entry(row)
+        return current
+
+    def compact(self):
+        """
+        Fold the journal into a new faq_entries snapshot and drop the folded
+        records. Readers see the same entries before and after, so the
+        revision does not change. Returns the number of records folded.
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            last_seq = self.conn.execute('SELECT MAX(seq) FROM faq_journal').fetchone()[0]
+            if last_seq is None:
+                self.conn.execute('COMMIT')
+                return 0
+            latest = self.conn.execute(
+                'SELECT * FROM faq_journal WHERE seq IN (SELECT MAX(seq) FROM faq_journal GROUP BY id) ORDER BY seq'
+            ).fetchall()
+            self.conn.executemany('DELETE FROM faq_entries WHERE id = ?',
+                                  [(row['id'],) for row in latest if row['op'] == 'delete'])
+            self.conn.executemany(UPSERT_SQL, [
+                (row['id'], row['question'], normalize_question(row['question']), row['answer'], row['source'],
+                 row['scheme'], row['metric'], row['content_hash'], row['created_at'])
+                for row in latest if row['op'] == 'upsert'
+            ])
+            folded = self.conn.execute('DELETE FROM faq_journal WHERE seq <= ?', (last_seq,)).rowcount
+            self.conn.execute("UPDATE store_meta SET value = ? WHERE key = 'snapshot_seq'", (str(last_seq),))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return folded
+
+    def journal_size(self):
+        """Number of journal records not yet compacted"""
+        return self.conn.execute('SELECT COUNT(*) FROM faq_journal').fetchone()[0]
+
+    def changes_since(self, seq):
+        """
+        IDs changed after journal position seq, as (upserted IDs, deleted
+        IDs, current position); None if the records since seq were already
+        compacted away and the caller has to reload everything
+        """
+        with self.read_transaction():
+            if seq < self.snapshot_seq:
+                return None
+            upserted, deleted = set(), set()
+            for row in self.conn.execute(
+                'SELECT id, op FROM faq_journal WHERE seq IN '
+                '(SELECT MAX(seq) FROM faq_journal WHERE seq > ? GROUP BY id)', (seq,)
+            ):
+                (upserted if row['op'] == 'upsert' else deleted).add(row['id'])
+            return upserted, deleted, self.journal_seq
+
+    def get(self, idx):
+        """Entry by ID, or None"""
+        row = self.conn.execute(f'SELECT {ENTRY_COLUMNS} FROM faq_current WHERE id = ?', (idx,)).fetchone()
+        return _entry(row) if row else None
+
+    def find(self, question):
+        """Entry whose question matches after folding case and whitespace, or None"""
+        # IDs are derived from the normalized question
+        return self.get(entry_id(question))
+
+    def count(self, scheme=None, metric=None):
+        """Number of entries, optionally for one scheme and/or metric"""
+        where, params = _filters(scheme, metric)
+        return self.conn.execute(f'SELECT COUNT(*) FROM faq_current{where}', params).fetchone()[0]
+
+    def iter_entries(self, page_size=1000, scheme=None, metric=None):
+        """
+        Yield entries in insertion order, one page of rows at a time, so
+        callers never hold more than a page of query results
+        """
+        where, params = _filters(scheme, metric)
+        where = where + (' AND' if where else ' WHERE') + ' pos > ?'
+        last_pos = 0
+        while True:
+            rows = self.conn.execute(
+                f'SELECT pos, {ENTRY_COLUMNS} FROM faq_current{where} ORDER BY pos LIMIT ?',
+                params + [last_pos, page_size]
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                last_pos = row['pos']
+                yield _entry(row)
+
+    def entry_ids(self):
+        """IDs of all entries"""
+        return {row[0] for row in self.conn.execute('SELECT id FROM faq_current')}
+
+    def import_json(self, json_path=FAQ_JSON_PATH):
+        """Upsert every entry of a JSON knowledge base file; returns the number changed"""
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return self.upsert(json.load(f))
+
+    def export_json(self, json_path=FAQ_JSON_PATH):
+        """Write the knowledge base as a JSON file (question, answer, source)"""
+        entries = [entry.to_dict() for entry in self.iter_entries()]
+        tmp_path = f"{json_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, json_path)
+        return len(entries)
+
+def _entry(row):
+    """FAQEntry for a faq_current row"""
+    return FAQEntry(row['id'], row['question'], row['answer'], SOURCES.intern(row['source']),
+                    sys.intern(row['scheme']), sys.intern(row['metric']), row['content_hash'])
+
+def has_changes(diff):
+    """Whether a merge diff added, changed or removed anything"""
+    return any(diff[kind] for kind in ('added', 'changed', 'removed'))
+
+def diff_summary(diff):
+    """One-line summary of a merge diff's sizes"""
+    return ', '.join(f"{len(diff[kind])} {kind}" for kind in DIFF_KINDS)
+
+def new_run_id():
+    """ID grouping the journal records of one update run"""
+    return time.strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:8]
+
+def _filters(scheme, metric):
+    """WHERE clause and parameters for optional scheme and metric filters"""
+    clauses, params = [], []
+    if scheme is not None:
+        clauses.append('scheme = ?')
+        params.append(scheme)
+    if metric is not None:
+        clauses.append('metric = ?')
+        params.append(metric)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+def open_store(path=KNOWLEDGE_DB_PATH, seed_json=FAQ_JSON_PATH):
+    """
+    Open the knowledge store, importing the JSON knowledge base the first
+    time so existing data carries over
+    """
+    store = KnowledgeStore(path)
+    if store.count() == 0 and seed_json and os.path.exists(seed_json):
+        imported = store.import_json(seed_json)
+        store.compact()
+        print(f"Imported {imported} FAQ entries from {seed_json} into {path}")
+    return store
+
+def merge_scraped_entries(new_entries, path=KNOWLEDGE_DB_PATH, run_id=None, prune_sources=False):
+    """
+    Merge freshly scraped entries into the knowledge store as one journaled
+    run; they replace existing entries with the same question and everything
+    else is kept (see KnowledgeStore.merge for prune_sources). Entries whose
+    content hash is unchanged are not rewritten. The journal is compacted
+    once it grows past COMPACT_AFTER.
+    Returns the merge diff; callers that need the whole knowledge base
+    page through the store rather than loading it here.
+    """
+    with open_store(path) as store:
+        diff = store.merge(new_entries, run_id, prune_sources)
+        if store.journal_size() > COMPACT_AFTER:
+            print(f"Compacted {store.compact()} journal records into a new snapshot")
+        return diff
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the FAQ knowledge store")
+    parser.add_argument('command', choices=['import', 'export', 'stats', 'compact'])
+    parser.add_argument('--db', default=KNOWLEDGE_DB_PATH)
+    parser.add_argument('--json', default=FAQ_JSON_PATH)
+    args = parser.parse_args()
+    with KnowledgeStore(args.db) as store:
+        if args.command == 'import':
+            print(f"Imported {store.import_json(args.json)} changed entries from {args.json} into {args.db}")
+        elif args.command == 'export':
+            print(f"Exported {store.export_json(args.json)} entries from {args.db} to {args.json}")
+        elif args.command == 'compact':
+            print(f"Compacted {store.compact()} journal records into a new snapshot")
+        else:
+            print(f"{store.count()} entries, revision {store.revision}, {store.journal_size()} journal records")
+            for (scheme,) in store.conn.execute('SELECT DISTINCT scheme FROM faq_current ORDER BY scheme'):
+                print(f"  {scheme}: {store.count(scheme=scheme)}")
@@ -0,0 +1,98 @@
+import os
+from collections import deque
+
+# Compliance phrase list; one phrase per line, '#' starts a comment
+OPINION_PHRASES_FILE = os.environ.get('MF_OPINION_PHRASES_FILE', 'opinionated_phrases.txt')
+
+# Returned instead of an answer for opinionated/portfolio questions
+REFUSAL_ANSWER = "I can only provide factual information about mutual funds. For personalized investment advice, please consult a certified financial advisor. You can learn more about making informed investment decisions at the official AMFI investor education resources."
+REFUSAL_SOURCE = "https://www.amfiindia.com/investor-corner/investor-education"
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over a set of phrases.
+    find() makes a single pass over the text, so its cost depends on the
+    length of the question and not on how many phrases are loaded.
+    """
+    def __init__(self, phrases):
+        self.phrases = []
+        # Per state: outgoing transitions, failure link, matched phrase index (-1 if none)
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [-1]
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        """Insert a phrase into the trie"""
+        state = 0
+        for char in phrase:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(-1)
+            state = next_state
+        if self.output[state] == -1:
+            self.output[state] = len(self.phrases)
+        self.phrases.append(phrase)
+
+    def _link(self):
+        """Compute failure links breadth-first and propagate outputs along them"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.output[next_state] == -1:
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def find(self, text):
+        """Return the first phrase found in text, or None"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] != -1:
+                return self.phrases[output[state]]
+        return None
+
+def load_phrases(path=OPINION_PHRASES_FILE):
+    """Read lowercase phrases from a phrase file, skipping blanks and comments"""
+    phrases = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            phrase = line.strip().lower()
+            if phrase and not phrase.startswith('#'):
+                phrases.append(phrase)
+    return phrases
+
+_matcher = None
+
+def get_opinion_matcher():
+    """Compile the phrase file into an automaton once per process"""
+    global _matcher
+    if _matcher is None:
+        _matcher = PhraseMatcher(load_phrases())
+    return _matcher
+
+def find_opinion_phrase(question):
+    """Return the compliance phrase an opinionated question matched, or None"""
+    return get_opinion_matcher().find(question.lower())
+
+def refusal_response(question):
+    """Polite refusal pointing to investor education resources"""
+    return {
+        "question": question,
+        "answer": REFUSAL_ANSWER,
+        "source": REFUSAL_SOURCE
+    }
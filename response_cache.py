@@ -0,0 +1,172 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Default bounds: cached result lists and how long they stay valid (seconds)
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 3600
+# Largest cosine distance between two query embeddings for the second one
+# to reuse the first one's results. Kept tight: paraphrases of the same
+# question sit well inside it, questions about a different metric do not.
+DEFAULT_SEMANTIC_RADIUS = 0.03
+
+class ResponseCache:
+    """
+    Bounded LRU/TTL cache of search results in front of retrieval.
+    The first tier is keyed on the normalized query; the second reuses the
+    results of a cached query whose embedding lies within semantic_radius
+    (cosine distance) of the new one. Semantic hits are only taken within
+    the same scope, e.g. the schemes a query names, so "NAV of the ELSS
+    fund" never answers "NAV of the large cap fund".
+    Everything is dropped when the knowledge-base version changes.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL,
+                 semantic_radius=DEFAULT_SEMANTIC_RADIUS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_radius = semantic_radius
+        self.version = None
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        # key -> (expires_at, results, slot, scope); most recently used last
+        self._items = OrderedDict()
+        # Row slot -> key for the normalized query embeddings in _vectors
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._vectors = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+
+    def __len__(self):
+        return len(self._items)
+
+    def bind(self, version):
+        """
+        Make the cache serve a knowledge-base version, clearing it if the
+        version changed
+        """
+        with self._lock:
+            if version != self.version:
+                if self._items:
+                    self.stats['invalidations'] += 1
+                self._clear()
+                self.version = version
+
+    def clear(self):
+        """
+        Drop every cached result
+        """
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        """
+        Drop every cached result; callers hold the lock
+        """
+        self._items.clear()
+        self._slot_keys = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._valid[:] = False
+
+    def get(self, key):
+        """
+        Results cached under exactly this key, or None
+        """
+        with self._lock:
+            results = self._lookup(key)
+            if results is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return copy.deepcopy(results)
+
+    def get_similar(self, embedding, scope=None):
+        """
+        Results of a cached query in the same scope whose embedding is within
+        the semantic radius of this one, or None
+        """
+        with self._lock:
+            if self._vectors is None or not self._valid.any():
+                self.stats['semantic_misses'] += 1
+                return None
+            similarities = self._vectors @ _normalize(embedding)
+            similarities[~self._valid] = -np.inf
+            for slot in np.argsort(-similarities):
+                if similarities[slot] < 1.0 - self.semantic_radius:
+                    break
+                key = self._slot_keys[slot]
+                if self._items[key][3] != scope:
+                    continue
+                results = self._lookup(key)
+                if results is not None:
+                    self.stats['semantic_hits'] += 1
+                    return copy.deepcopy(results)
+            self.stats['semantic_misses'] += 1
+            return None
+
+    def put(self, key, results, embedding=None, scope=None):
+        """
+        Cache results under a key; with an embedding they also serve
+        semantically close queries in the same scope
+        """
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            while len(self._items) >= self.max_entries:
+                self._remove(next(iter(self._items)))
+                self.stats['evictions'] += 1
+            slot = None
+            if embedding is not None:
+                vector = _normalize(embedding)
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, len(vector)), dtype='float32')
+                slot = self._free_slots.pop()
+                self._vectors[slot] = vector
+                self._valid[slot] = True
+                self._slot_keys[slot] = key
+            self._items[key] = (time.monotonic() + self.ttl, copy.deepcopy(results), slot, scope)
+
+    def _lookup(self, key):
+        """
+        Cached results for a key, refreshing its LRU position; expired
+        entries are removed. Callers hold the lock.
+        """
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            self._remove(key)
+            self.stats['expirations'] += 1
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def _remove(self, key):
+        _, _, slot, _ = self._items.pop(key)
+        if slot is not None:
+            self._valid[slot] = False
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def get_stats(self):
+        """
+        Counters plus the current size and the combined hit rate
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._items)
+        hits = stats.get('hits', 0) + stats.get('semantic_hits', 0)
+        # A miss on the first tier is followed by a semantic lookup when an
+        # embedding is available, so count each query once
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
+
+def _normalize(embedding):
+    """
+    Flatten an embedding to float32 with unit length
+    """
+    vector = np.asarray(embedding, dtype='float32').reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
@@ -0,0 +1,63 @@
+from text_utils import fold_aliases, tokenize
+
+# Entries that name no particular scheme (general mutual fund concepts)
+GENERAL_SHARD = 'general'
+
+# Scheme keys and the alias-folded phrases that name them in a question
+SCHEME_PHRASES = {
+    'icici-prudential-elss-tax-saver-fund': ['elss tax saver fund', 'elss tax saver', 'elss'],
+    'icici-prudential-large-cap-fund': ['large cap fund', 'large cap'],
+    'icici-prudential-multi-asset-fund': ['multi asset fund', 'multi asset'],
+    'icici-prudential-bluechip-fund': ['bluechip fund', 'bluechip'],
+    'icici-prudential-focused-equity-fund': ['focused equity fund', 'focused equity']
+}
+
+class SchemeRouter:
+    """
+    Token trie over scheme names and aliases.
+    route() walks the question's tokens once, taking the longest scheme
+    phrase at each position, so the cost does not grow with the number
+    of schemes.
+    """
+    # Trie key marking the end of a phrase; tokens are always strings
+    END = None
+
+    def __init__(self, scheme_phrases=SCHEME_PHRASES):
+        self.trie = {}
+        for scheme, phrases in scheme_phrases.items():
+            for phrase in phrases:
+                self.add(scheme, phrase)
+
+    def add(self, scheme, phrase):
+        """Register a phrase that names a scheme"""
+        node = self.trie
+        for token in fold_aliases(tokenize(phrase, drop_stopwords=False)):
+            node = node.setdefault(token, {})
+        node[self.END] = scheme
+
+    def route(self, text):
+        """Return the schemes named in text, in order of appearance"""
+        tokens = fold_aliases(tokenize(text, drop_stopwords=False))
+        schemes = []
+        i = 0
+        while i < len(tokens):
+            node = self.trie
+            matched, matched_end = None, i
+            j = i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if self.END in node:
+                    matched, matched_end = node[self.END], j
+            if matched is None:
+                i += 1
+                continue
+            if matched not in schemes:
+                schemes.append(matched)
+            i = matched_end
+        return schemes
+
+    def shard_for(self, question):
+        """Shard an FAQ entry belongs to: the first scheme it names, else general"""
+        schemes = self.route(question)
+        return schemes[0] if schemes else GENERAL_SHARD
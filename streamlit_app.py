@@ -1,100 +1,31 @@
 import streamlit as st
-import json
-import re
-from vector_db import search_similar_questions, initialize_vector_db
+from collections import deque
+from vector_db import start_hot_reload, warm_up
+from faq_engine import find_relevant_faq, kb_version, resolve_answer
+from answer_render import history_html, response_html
 
-# Load FAQ data
-with open('mf_faq_data.json', 'r') as f:
-    faq_data = json.load(f)
+@st.cache_resource(show_spinner=False)
+def start_background_services():
+    """
+    Load the vector database and encoder in the background so the page
+    renders immediately, and pick up new scraper output as it arrives.
+    Cached as a resource, so this runs once per server process rather than
+    on every script rerun.
+    """
+    warm_up()
+    start_hot_reload()
+    return True
 
-# Initialize vector database
-initialize_vector_db()
+@st.cache_data(max_entries=1024, ttl=3600, show_spinner=False)
+def answer_question(question, version):
+    """
+    Answer a question, cached across reruns and sessions per
+    knowledge-base version (the version is only part of the cache key)
+    """
+    return find_relevant_faq(question)
 
-def find_relevant_faq(question):
-    """Find the most relevant FAQ entry for a given question using RAG"""
-    question_lower = question.lower()
-    
-    # Check for opinionated/portfolio questions and refuse politely
-    opinionated_keywords = [
-        'should i buy', 'should i sell', 'is it good', 'recommend', 
-        'best fund', 'which fund', 'portfolio', 'investment advice',
-        'where to invest', 'good time to invest', 'risk level', 'best mutual fund',
-        'good for long term', 'recommend a portfolio', 'invest in'
-    ]
-    
-    for keyword in opinionated_keywords:
-        if keyword in question_lower:
-            return {
-                "question": question,
-                "answer": "I can only provide factual information about mutual funds. For personalized investment advice, please consult a certified financial advisor. You can learn more about making informed investment decisions at the official AMFI investor education resources.",
-                "source": "https://www.amfiindia.com/investor-corner/investor-education"
-            }
-    
-    # Use vector database to find similar questions
-    try:
-        similar_questions = search_similar_questions(question, k=1)
-        if similar_questions and similar_questions[0]['distance'] < 1.0:  # Threshold for similarity
-            return similar_questions[0]
-    except Exception as e:
-        print(f"Error in vector search: {e}")
-    
-    # Fallback to keyword matching with ICICI Prudential focus
-    keywords = question_lower.split()
-    best_match = None
-    best_score = 0
-    
-    for entry in faq_data:
-        entry_question_lower = entry['question'].lower()
-        score = 0
-        
-        # Count matching keywords
-        for keyword in keywords:
-            if keyword in entry_question_lower:
-                score += 1
-        
-        # Boost score for ICICI Prudential related questions
-        if 'icici' in question_lower and 'icici' in entry_question_lower:
-            score += 2
-        
-        # Update best match if this entry has a higher score
-        if score > best_score:
-            best_score = score
-            best_match = entry
-    
-    # Return best match if found, otherwise first entry
-    return best_match if best_match else (faq_data[0] if faq_data else {"error": "No data available"})
-
-def format_table_with_colors(table_content):
-    """Format table content with color coding for positive and negative numbers"""
-    lines = table_content.split('\n')
-    formatted_lines = []
-    
-    for i, line in enumerate(lines):
-        if i >= 2 and line.strip():  # Skip headers and process data rows
-            # Split by tabs to get individual cells
-            cells = line.split('\t')
-            if len(cells) >= 5:
-                # Color code the last column (Change %)
-                change_cell = cells[4]
-                # Extract numeric value
-                change_value = re.search(r'(-?\d+\.?\d*)', change_cell)
-                if change_value:
-                    try:
-                        value = float(change_value.group(1))
-                        if value > 0:
-                            # Green for positive values
-                            cells[4] = f"<span style='color: green; font-weight: bold;'>{change_cell}</span>"
-                        elif value < 0:
-                            # Red for negative values
-                            cells[4] = f"<span style='color: red; font-weight: bold;'>{change_cell}</span>"
-                    except ValueError:
-                        # If conversion fails, leave as is
-                        pass
-                # Rejoin the cells
-                line = '\t'.join(cells)
-        formatted_lines.append(line)
-    
-    return '\n'.join(formatted_lines)
+# Exchanges kept per session; only these are ever displayed
+HISTORY_SIZE = 3
 
 # Streamlit app
 st.set_page_config(
@@ -103,6 +34,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Must follow set_page_config: before Streamlit 1.44 any element sent
+# first, such as a cache spinner, makes set_page_config raise
+start_background_services()
+
 # Custom CSS for better UI
 st.markdown("""
 <style>
@@ -183,6 +118,14 @@ st.markdown("""
         white-space: pre-wrap; /* Preserve whitespace and line breaks */
     }
     
+    /* Note on history answers the knowledge base changed since they were asked */
+    .kb-updated-note {
+        font-size: 0.85rem;
+        color: #6c757d;
+        font-style: italic;
+        margin: 0.3rem 0 0.6rem 0;
+    }
+    
     /* Source link */
     .source-link {
         color: #1e3c72;
@@ -350,14 +293,24 @@ st.markdown("""
 # Header
 st.markdown("<div class='main-header'><h1>💰 Mutual Fund FAQ Assistant</h1><p>Get factual information about ICICI Prudential mutual funds and general mutual fund concepts</p></div>", unsafe_allow_html=True)
 
-# Initialize session state for chat history
+# Initialize session state for chat history: a ring buffer of
+# (question, entry ID, knowledge-base version) tuples. Answers are looked
+# up in the shared index when displayed, so a session's footprint does not
+# grow with the answers or the number of questions asked. The version
+# marks history answers asked before a later knowledge-base update.
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=HISTORY_SIZE)
+if 'last_question' not in st.session_state:
+    st.session_state.last_question = None
 
-# Main content area
-col1, col2 = st.columns([3, 1])
+# Reruns triggered by widgets inside a fragment only re-execute that
+# fragment, so the CSS, header, sidebar and footer are sent once per page
+# load. Older Streamlit versions without fragments rerun the whole page.
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
 
-with col1:
+@fragment
+def chat_panel():
+    """Question input, example questions, the current response and the history"""
     # User input
     user_question = st.text_input("Ask a question about mutual funds:", placeholder="e.g., What is the expense ratio of ICICI Prudential ELSS Tax Saver Fund?")
     
@@ -407,72 +360,41 @@ with col1:
                 user_question = example["question"]
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Process the question if submitted
-    if user_question:
-        # Find relevant FAQ
-        result = find_relevant_faq(user_question)
+    # Process the question once per submission; other reruns (widget
+    # clicks, reloads) reuse the stored result
+    if user_question and user_question != st.session_state.last_question:
+        version = kb_version()
+        result = answer_question(user_question, version)
+        st.session_state.last_question = user_question
         
-        # Add to chat history
-        st.session_state.chat_history.append(("user", user_question))
-        st.session_state.chat_history.append(("assistant", result))
-    
-    # Display current response if there's a question
-    if user_question:
-        result = find_relevant_faq(user_question)
+        # Add to chat history; refusals have no entry ID
+        st.session_state.chat_history.append((user_question, result.get('id'), version))
+    
+    # Display current response if there's a question.
+    # Answer HTML is rendered once per entry and knowledge-base version.
+    version = kb_version()
+    if user_question and st.session_state.chat_history:
+        question, entry_id, _ = st.session_state.chat_history[-1]
         st.markdown("### 📤 Response")
-        
-        # Format the answer text to preserve whitespace and handle code blocks
-        answer_text = result['answer']
-        if '```' in answer_text:
-            # Handle code blocks
-            parts = answer_text.split('```')
-            formatted_answer = ""
-            for i, part in enumerate(parts):
-                if i % 2 == 0:
-                    # Regular text
-                    formatted_answer += part
-                else:
-                    # Code block - check if it's a table and format with colors
-                    if "Company Name" in part and "As on Date" in part:
-                        formatted_table = format_table_with_colors(part)
-                        formatted_answer += f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto; white-space: pre;'>{formatted_table}</pre>"
-                    else:
-                        formatted_answer += f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto;'>{part}</pre>"
-            st.markdown(f"<div class='response-container'><h3>{result['question']}</h3><div class='answer-text'>{formatted_answer}</div><br><a href='{result['source']}' class='source-link' target='_blank'>🔗 Source: {result['source']}</a></div>", unsafe_allow_html=True)
-        else:
-            # Regular text
-            st.markdown(f"<div class='response-container'><h3>{result['question']}</h3><div class='answer-text'>{answer_text}</div><br><a href='{result['source']}' class='source-link' target='_blank'>🔗 Source: {result['source']}</a></div>", unsafe_allow_html=True)
-    
-    # Display chat history
+        st.markdown(response_html(resolve_answer(question, entry_id), version), unsafe_allow_html=True)
+    
+    # Display chat history as a single element
     if st.session_state.chat_history:
         st.markdown("### 💬 Conversation History")
-        st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
-        for role, content in st.session_state.chat_history[-6:]:  # Show last 3 exchanges
-            if role == "user":
-                st.markdown(f"<div class='message user-message'><strong>You:</strong><br>{content}</div>", unsafe_allow_html=True)
-            else:
-                # Format the answer text to preserve whitespace and handle code blocks
-                answer_text = content['answer']
-                if '```' in answer_text:
-                    # Handle code blocks
-                    parts = answer_text.split('```')
-                    formatted_answer = ""
-                    for i, part in enumerate(parts):
-                        if i % 2 == 0:
-                            # Regular text
-                            formatted_answer += part
-                        else:
-                            # Code block - check if it's a table and format with colors
-                            if "Company Name" in part and "As on Date" in part:
-                                formatted_table = format_table_with_colors(part)
-                                formatted_answer += f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto; white-space: pre;'>{formatted_table}</pre>"
-                            else:
-                                formatted_answer += f"<pre style='background-color: #f8f9fa; padding: 1rem; border-radius: 8px; overflow-x: auto;'>{part}</pre>"
-                    st.markdown(f"<div class='message assistant-message'><strong>Assistant:</strong><br><div class='answer-text'>{formatted_answer}</div><br><a href='{content['source']}' class='source-link' target='_blank'>🔗 Source: {content['source']}</a></div>", unsafe_allow_html=True)
-                else:
-                    # Regular text
-                    st.markdown(f"<div class='message assistant-message'><strong>Assistant:</strong><br><div class='answer-text'>{answer_text}</div><br><a href='{content['source']}' class='source-link' target='_blank'>🔗 Source: {content['source']}</a></div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        # Answers are always the current ones; those asked against an
+        # earlier knowledge-base version say so
+        messages = [
+            (question, resolve_answer(question, entry_id),
+             None not in (asked_version, version) and asked_version != version)
+            for question, entry_id, asked_version in st.session_state.chat_history
+        ]
+        st.markdown(history_html(messages, version), unsafe_allow_html=True)
+
+# Main content area
+col1, col2 = st.columns([3, 1])
+
+with col1:
+    chat_panel()
 
 with col2:
     # Sidebar content
@@ -0,0 +1,77 @@
+import hashlib
+import re
+
+# Filler words that carry no signal for matching FAQ questions
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for',
+    'from', 'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'the',
+    'to', 'what', 'whats', 'which', 'who', 'with'
+])
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text, drop_stopwords=True):
+    """Split text into lowercase word tokens, optionally without stopwords"""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if drop_stopwords:
+        return [token for token in tokens if token not in STOPWORDS]
+    return tokens
+
+# Informal fund names folded onto the wording used in the stored questions.
+# Keys and values are matched as whole-token phrases after punctuation folding.
+FUND_ALIASES = {
+    'icici': 'icici prudential',
+    'icici prudential': 'icici prudential',
+    'icici pru': 'icici prudential',
+    'icicipru': 'icici prudential',
+    'icici prudential mf': 'icici prudential',
+    'icici mutual fund': 'icici prudential',
+    'elss fund': 'elss tax saver fund',
+    'elss tax saving fund': 'elss tax saver fund',
+    'tax saver fund': 'elss tax saver fund',
+    'elss tax saver fund': 'elss tax saver fund',
+    'largecap fund': 'large cap fund',
+    'largecap': 'large cap',
+    'multiasset fund': 'multi asset fund',
+    'multi asset': 'multi asset',
+    'blue chip fund': 'bluechip fund',
+    'focused fund': 'focused equity fund',
+    'focussed equity fund': 'focused equity fund'
+}
+
+ALIAS_PHRASES = {tuple(alias.split()): tuple(canonical.split()) for alias, canonical in FUND_ALIASES.items()}
+MAX_ALIAS_TOKENS = max(len(phrase) for phrase in ALIAS_PHRASES)
+
+def fold_aliases(tokens):
+    """Replace the longest matching alias phrase at each position with its canonical form"""
+    folded = []
+    i = 0
+    while i < len(tokens):
+        for length in range(min(MAX_ALIAS_TOKENS, len(tokens) - i), 0, -1):
+            canonical = ALIAS_PHRASES.get(tuple(tokens[i:i + length]))
+            if canonical is not None:
+                folded.extend(canonical)
+                i += length
+                break
+        else:
+            folded.append(tokens[i])
+            i += 1
+    return folded
+
+def normalize_query(text):
+    """Fold case, punctuation, whitespace and fund aliases for exact matching"""
+    return ' '.join(fold_aliases(tokenize(text, drop_stopwords=False)))
+
+def normalize_question(text):
+    """Normalize question text for hashing (case and whitespace folded)"""
+    return ' '.join(text.lower().split())
+
+def entry_id(question):
+    """Stable 63-bit ID for an FAQ entry, derived from its normalized question"""
+    digest = hashlib.sha1(normalize_question(question).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') & 0x7FFFFFFFFFFFFFFF
+
+def content_hash(question, answer, source):
+    """Stable 63-bit hash of an FAQ entry's exact text; it changes whenever any field does"""
+    digest = hashlib.sha1('\0'.join((question, answer, source)).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') & 0x7FFFFFFFFFFFFFFF
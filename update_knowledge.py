@@ -1,9 +1,10 @@
 import requests
 from bs4 import BeautifulSoup
-import json
 import time
 import re
 from urllib.parse import urljoin, urlparse
+from itertools import islice
+from knowledge_store import KNOWLEDGE_DB_PATH, KnowledgeStore, diff_summary, merge_scraped_entries
 
 # ICICI Prudential schemes we want to focus on
 SCHEMES = [
@@ -633,56 +634,44 @@ def update_knowledge_database():
             seen_questions.add(question)
             unique_faqs.append(faq)
     
-    # Load existing data
-    try:
-        with open("mf_faq_data.json", 'r') as f:
-            existing_data = json.load(f)
-    except FileNotFoundError:
-        existing_data = []
-    
-    # Merge with existing data, prioritizing new data
-    merged_data = []
-    existing_questions = {item["question"].lower().strip() for item in existing_data}
-    
-    # Add new data first
-    for item in unique_faqs:
-        merged_data.append(item)
-        if item["question"].lower().strip() in existing_questions:
-            existing_questions.remove(item["question"].lower().strip())
-    
-    # Add remaining existing data
-    for item in existing_data:
-        if item["question"].lower().strip() in existing_questions:
-            merged_data.append(item)
-    
-    # Save to file
-    with open("mf_faq_data.json", 'w') as f:
-        json.dump(merged_data, f, indent=2)
-    
-    print(f"Updated knowledge database with {len(merged_data)} FAQ entries")
-    print(f"Added {len(unique_faqs)} new entries")
-    print(f"Retained {len(merged_data) - len(unique_faqs)} existing entries")
+    # Merge into the knowledge store, prioritizing new data; existing
+    # entries with other questions are retained and unchanged ones are not rewritten
+    diff = merge_scraped_entries(unique_faqs)
+    print(f"Knowledge store: {diff_summary(diff)}")
     
-    # Print sample entries
-    print("\nSample FAQ entries:")
-    for i, entry in enumerate(merged_data[:15]):
-        print(f"{i+1}. {entry['question']}")
-        print(f"   Source: {entry['source']}")
-        print()
-    
-    # Print validation summary
-    accessible_sources = 0
-    total_sources = len(merged_data)
-    for entry in merged_data:
-        if is_url_accessible(entry['source']):
-            accessible_sources += 1
+    # Rebuild the index artifact that serving processes load, unless nothing changed
+    try:
+        from build_index import update_artifact
+        update_artifact(diff)
+    except Exception as e:
+        print(f"Error rebuilding index artifact: {e}")
+    
+    # Page through the store for the report instead of loading every entry
+    with KnowledgeStore(KNOWLEDGE_DB_PATH, read_only=True) as store:
+        total_entries = store.count()
+        print(f"Updated knowledge database with {total_entries} FAQ entries")
+        print(f"Scraped {len(unique_faqs)} entries ({len(diff['added'])} new, {len(diff['changed'])} changed)")
+        print(f"Retained {total_entries - len(unique_faqs)} existing entries")
+        
+        # Print sample entries
+        print("\nSample FAQ entries:")
+        for i, entry in enumerate(islice(store.iter_entries(), 15)):
+            print(f"{i+1}. {entry.question}")
+            print(f"   Source: {entry.source}")
+            print()
+        
+        # Print validation summary
+        accessible_sources = 0
+        for entry in store.iter_entries():
+            if is_url_accessible(entry.source):
+                accessible_sources += 1
     
     print(f"\nURL Validation Summary:")
-    print(f"Accessible sources: {accessible_sources}/{total_sources}")
-    print(f"Inaccessible sources: {total_sources - accessible_sources}/{total_sources}")
+    print(f"Accessible sources: {accessible_sources}/{total_entries}")
+    print(f"Inaccessible sources: {total_entries - accessible_sources}/{total_entries}")
     
-    return merged_data
+    return diff
 
 if __name__ == "__main__":
-    updated_database = update_knowledge_database()
-    print(f"Knowledge database update completed. Total entries: {len(updated_database)}")
\ No newline at end of file
+    diff = update_knowledge_database()
+    print(f"Knowledge database update completed: {diff_summary(diff)}")
\ No newline at end of file
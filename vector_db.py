@@ -1,80 +1,1282 @@
 import json
+import re
+import hashlib
+import shutil
+import threading
+import time
+from collections import Counter
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 import os
+from encoders import encoder_name, load_encoder
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from text_utils import entry_id, normalize_query, normalize_question
+from scheme_router import SchemeRouter, GENERAL_SHARD
+from response_cache import ResponseCache
+from knowledge_store import KnowledgeStore, KNOWLEDGE_DB_PATH
+from kb_snapshot import KBSnapshot, write_snapshot
+from faq_entry import as_entry
+
+# Directory holding the persistent question-embedding cache
+EMBEDDING_CACHE_DIR = '.embedding_cache'
+
+# Index metadata (metric and calibrated match threshold) written by calibrate_threshold.py
+INDEX_METADATA_PATH = 'vector_index_meta.json'
+
+# Default minimum score for a vector hit to be trusted, per metric.
+# Cosine scores are similarities in [-1, 1]; L2 scores are negated distances.
+DEFAULT_MATCH_THRESHOLDS = {
+    'cosine': 0.6,
+    'l2': -1.0
+}
+
+# faiss and sentence_transformers (with torch) are imported on first use,
+# so importing this module stays cheap for pages that never search.
+
+# Process-wide retrieval counters; they survive index swaps on reload.
+# exact_hits are queries answered without running the encoder.
+search_stats = Counter()
+
+# Versioned index artifacts written by build_index.py; CURRENT names the live one
+ARTIFACT_DIR = 'index_artifacts'
+ARTIFACT_FORMAT_VERSION = 6
+
+class EmbeddingCache:
+    """
+    Persistent on-disk cache of question embeddings.
+    Keys are the model name plus a hash of the normalized question text,
+    so only new or changed questions have to be encoded at startup.
+    """
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.path = os.path.join(cache_dir, f"{safe_name}.npz")
+        # Loaded on first use and released after saving, so a serving
+        # process does not keep a float32 copy next to the index
+        self.vectors = None
+        self.dirty = False
+        self.last_encoded = 0
+
+    def _load(self):
+        """
+        Load cached vectors from disk, ignoring a missing or unreadable file
+        """
+        self.vectors = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                for key, vector in zip(data['keys'], data['vectors']):
+                    self.vectors[str(key)] = vector
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache {self.path}: {e}")
+            self.vectors = {}
+
+    def key(self, text):
+        """
+        Cache key for a question: model name plus hash of the normalized text
+        """
+        digest = hashlib.sha1(normalize_question(text).encode('utf-8')).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    def encode(self, model, texts):
+        """
+        Return embeddings for texts, encoding only the ones missing from the cache
+        """
+        if self.vectors is None:
+            self._load()
+        keys = [self.key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = model.encode(list(missing.values()))
+            for key, vector in zip(missing.keys(), new_vectors):
+                self.vectors[key] = np.asarray(vector, dtype='float32')
+            self.dirty = True
+        self.last_encoded = len(missing)
+        if not keys:
+            return np.zeros((0, model.get_sentence_embedding_dimension()), dtype='float32')
+        return np.stack([self.vectors[key] for key in keys])
+
+    def save(self):
+        """
+        Write the cache to disk atomically if anything new was encoded
+        """
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        keys = list(self.vectors.keys())
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=np.array(keys), vectors=np.stack([self.vectors[k] for k in keys]))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def release(self):
+        """
+        Save pending vectors and drop the in-memory copy
+        """
+        self.save()
+        self.vectors = None
+
+# Build and search parameters for each supported index kind
+DEFAULT_INDEX_PARAMS = {
+    'flat': {},
+    'hnsw': {'M': 32, 'efConstruction': 200, 'efSearch': 64},
+    'ivf': {'nlist': 1024, 'nprobe': 16}
+}
+
+# Vector storage formats: full float32, scalar-quantized float16 / int8,
+# or product-quantized codes (pq_m sub-vectors of pq_nbits bits each)
+STORAGE_TYPES = ('float32', 'float16', 'int8', 'pq')
+DEFAULT_PQ_PARAMS = {'pq_m': 48, 'pq_nbits': 8}
+
+# Fraction of tombstoned vectors after which an HNSW index is rebuilt
+HNSW_REBUILD_FRACTION = 0.2
+
+def build_index(kind, dimension, metric='cosine', params=None, storage='float32'):
+    """
+    Create an empty FAISS index of the given kind ('flat', 'hnsw' or 'ivf')
+    and storage format (see STORAGE_TYPES) with its build and search
+    parameters applied. Returns the raw index; callers wrap it in an ID map.
+    """
+    if kind not in DEFAULT_INDEX_PARAMS:
+        raise ValueError(f"Unsupported index kind: {kind}")
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unsupported storage type: {storage}")
+    import faiss
+    params = {**DEFAULT_INDEX_PARAMS[kind], **DEFAULT_PQ_PARAMS, **(params or {})}
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == 'cosine' else faiss.METRIC_L2
+    sq_type = {
+        'float16': faiss.ScalarQuantizer.QT_fp16,
+        'int8': faiss.ScalarQuantizer.QT_8bit
+    }.get(storage)
+    
+    if kind == 'flat':
+        if storage == 'float32':
+            return faiss.IndexFlat(dimension, faiss_metric)
+        if storage == 'pq':
+            return faiss.IndexPQ(dimension, params['pq_m'], params['pq_nbits'], faiss_metric)
+        return faiss.IndexScalarQuantizer(dimension, sq_type, faiss_metric)
+    
+    if kind == 'hnsw':
+        if storage == 'float32':
+            index = faiss.IndexHNSWFlat(dimension, params['M'], faiss_metric)
+        elif storage == 'pq':
+            index = faiss.IndexHNSWPQ(dimension, params['pq_m'], params['M'], params['pq_nbits'], faiss_metric)
+        else:
+            index = faiss.IndexHNSWSQ(dimension, sq_type, params['M'], faiss_metric)
+        index.hnsw.efConstruction = params['efConstruction']
+    else:
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        if storage == 'float32':
+            index = faiss.IndexIVFFlat(quantizer, dimension, params['nlist'], faiss_metric)
+        elif storage == 'pq':
+            index = faiss.IndexIVFPQ(quantizer, dimension, params['nlist'], params['pq_m'], params['pq_nbits'], faiss_metric)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, params['nlist'], sq_type, faiss_metric)
+    set_search_params(index, kind, params)
+    return index
+
+def min_training_size(kind, params, storage):
+    """
+    Fewest vectors needed to train an index of this kind and storage
+    """
+    needed = 1
+    if kind == 'ivf':
+        needed = max(needed, params['nlist'])
+    if storage == 'pq':
+        needed = max(needed, 2 ** params.get('pq_nbits', DEFAULT_PQ_PARAMS['pq_nbits']))
+    return needed
+
+def set_search_params(index, kind, params):
+    """
+    Apply query-time parameters (HNSW efSearch, IVF nprobe) to a raw index
+    """
+    if kind == 'hnsw' and 'efSearch' in params:
+        index.hnsw.efSearch = params['efSearch']
+    elif kind == 'ivf' and 'nprobe' in params:
+        index.nprobe = params['nprobe']
 
 class VectorDB:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_dir=EMBEDDING_CACHE_DIR,
+                 metric='cosine', metadata_path=INDEX_METADATA_PATH,
+                 index_kind='flat', index_params=None, storage='float32', model=None,
+                 sharded=True):
         """
-        Initialize the VectorDB with a sentence transformer model
+        Initialize the VectorDB with a sentence transformer model.
+        metric is 'cosine' (inner product over L2-normalized vectors) or 'l2'.
+        index_kind is 'flat' (exact), 'hnsw' or 'ivf'; index_params overrides
+        the defaults in DEFAULT_INDEX_PARAMS for that kind.
+        storage is one of STORAGE_TYPES; vectors live only inside the index.
+        model reuses an already loaded encoder, e.g. from the index being replaced.
+        sharded partitions the vectors into one index per scheme (plus a
+        general one): queries that name a scheme search only those shards,
+        the rest fan out across all of them.
         """
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.faq_data = []
-        self.embeddings = []
-        
-    def load_faq_data(self, faq_file_path):
+        if metric not in DEFAULT_MATCH_THRESHOLDS:
+            raise ValueError(f"Unsupported metric: {metric}")
+        if index_kind not in DEFAULT_INDEX_PARAMS:
+            raise ValueError(f"Unsupported index kind: {index_kind}")
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unsupported storage type: {storage}")
+        self.model_name = model_name
+        # The encoder and the index are created on first use
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._dimension = None
+        self.embedding_cache = EmbeddingCache(encoder_name(model_name), cache_dir) if cache_dir else None
+        self.metric = metric
+        self.metadata_path = metadata_path
+        self.index_kind = index_kind
+        self.index_params = {**DEFAULT_INDEX_PARAMS[index_kind], **(index_params or {})}
+        self.storage = storage
+        self.metadata = self._load_metadata(model_name)
+        self.entries = {}
+        # Lexical side of hybrid retrieval, kept in step with the vectors
+        self.lexical = BM25Index()
+        # Normalized question text (see text_utils.normalize_query) -> IDs of
+        # the entries with that question, oldest first; several questions can
+        # fold to the same text
+        self.exact_index = {}
+        # Entries upserted without their vectors yet (see encode_pending)
+        self._unencoded = []
+        # HNSW cannot remove vectors, so deleted IDs are filtered at search time
+        self.tombstones = set()
+        # Shard key -> index holding the vectors of that shard's entries.
+        # Each vector is stored in exactly one shard; an unsharded database
+        # keeps everything in the general one.
+        self.router = SchemeRouter() if sharded else None
+        self.shards = {}
+        self.shard_of = {}
+        # Set when the index comes from an artifact loaded for serving
+        self.read_only = False
+        # Memory-mapped entry snapshot of a loaded artifact (see kb_snapshot)
+        self.snapshot = None
+        # Knowledge-base generation this index was built from (see kb_generation)
+        self.generation = None
+        # Bumped by every in-place change to the entries
+        self.revision = 0
+        # KnowledgeStore journal position the entries reflect (see sync_store)
+        self.kb_seq = None
+
+    @property
+    def model(self):
+        """
+        Sentence encoder, loaded on first access
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # SentenceTransformer or ONNX Runtime, per MF_ENCODER_BACKEND
+                    self._model = load_encoder(self.model_name)
+        return self._model
+
+    @property
+    def model_loaded(self):
+        """
+        Whether the encoder has been loaded yet
+        """
+        return self._model is not None
+
+    @property
+    def dimension(self):
+        """
+        Embedding dimension, from an artifact manifest or the encoder
+        """
+        if self._dimension is None:
+            self._dimension = self.model.get_sentence_embedding_dimension()
+        return self._dimension
+
+    def warm_up(self):
+        """
+        Load the encoder and run one encode so the first real query is fast
+        """
+        self.model.encode(['warm up'])
+
+    def _new_index(self, params=None, storage=None):
+        """
+        Create an empty shard index; vectors are stored under stable entry
+        IDs so entries can be replaced in place
+        """
+        import faiss
+        raw_index = build_index(self.index_kind, self.dimension, self.metric,
+                                params or self.index_params, storage or self.storage)
+        return faiss.IndexIDMap2(raw_index)
+
+    def _trained_shard(self, key, embeddings):
+        """
+        Index of a shard, created on first use. IVF and quantized indexes
+        are trained on the shard's first batch of vectors; with too few,
+        nlist is shrunk to fit the data and PQ falls back to int8 scalar
+        quantization.
+        """
+        index = self.shards.get(key)
+        if index is not None and index.is_trained:
+            return index
+        params, storage = self.index_params, self.storage
+        if self.index_kind == 'ivf' and len(embeddings) < params['nlist']:
+            params = {**params, 'nlist': max(1, len(embeddings) // 39)}
+            print(f"Only {len(embeddings)} vectors to train the {key} shard on, using nlist={params['nlist']}")
+        if storage == 'pq' and len(embeddings) < min_training_size('flat', params, storage):
+            storage = 'int8'
+            print(f"Only {len(embeddings)} vectors to train the {key} shard on, using int8 instead of PQ codes")
+        index = self._new_index(params, storage)
+        index.train(embeddings)
+        self.shards[key] = index
+        return index
+
+    def _shard_key(self, entry):
+        """
+        Shard an entry's vector belongs to: its scheme, or the general
+        shard in an unsharded database
+        """
+        return entry.scheme if self.router is not None else GENERAL_SHARD
+
+    def vector_count(self):
+        """
+        Vectors held across all shards, tombstoned ones included
+        """
+        return sum(index.ntotal for index in self.shards.values())
+
+    def _load_metadata(self, model_name):
+        """
+        Load index metadata, keeping a calibrated threshold only if it was
+        tuned for the same model and metric
+        """
+        metadata = {
+            'model_name': model_name,
+            'metric': self.metric,
+            'match_threshold': DEFAULT_MATCH_THRESHOLDS[self.metric]
+        }
+        if self.metadata_path and os.path.exists(self.metadata_path):
+            try:
+                with open(self.metadata_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('model_name') == model_name and saved.get('metric') == self.metric:
+                    metadata.update(saved)
+            except Exception as e:
+                print(f"Ignoring unreadable index metadata {self.metadata_path}: {e}")
+        return metadata
+
+    def reload_metadata(self):
+        """
+        Re-read the index metadata, e.g. so an index extended from an
+        artifact takes the current calibrated threshold, not the one the
+        artifact was built with
+        """
+        self.metadata = self._load_metadata(self.model_name)
+
+    def save_metadata(self):
+        """
+        Write the index metadata next to the knowledge base
+        """
+        with open(self.metadata_path, 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, indent=2)
+
+    @property
+    def match_threshold(self):
+        """
+        Minimum score for a vector search hit to count as a match
+        """
+        return self.metadata['match_threshold']
+
+    def is_match(self, result):
+        """
+        Whether a search result is similar enough to answer the query directly
+        """
+        return result['score'] is not None and result['score'] >= self.match_threshold
+
+    def _prepare(self, embeddings):
+        """
+        Convert embeddings to float32 and L2-normalize them in cosine mode
+        """
+        embeddings = np.array(embeddings, dtype='float32')
+        if self.metric == 'cosine':
+            import faiss
+            faiss.normalize_L2(embeddings)
+        return embeddings
+
+    @property
+    def faq_data(self):
+        """
+        FAQ entries currently held in the index, in insertion order
+        """
+        return list(self.entries.values())
+
+    def _encode(self, questions):
+        """
+        Encode questions, reusing cached embeddings where available. The
+        cache stays loaded between calls, so a load encoding page by page
+        reads it once; callers release it when they are done.
+        """
+        if self.embedding_cache is None:
+            return self._prepare(self.model.encode(questions))
+        embeddings = self.embedding_cache.encode(self.model, questions)
+        encoded = self.embedding_cache.last_encoded
+        print(f"Encoded {encoded} new questions, {len(questions) - encoded} loaded from embedding cache")
+        return self._prepare(embeddings)
+
+    def _check_writable(self):
+        """
+        Refuse to modify an index that was loaded read-only from an artifact
+        """
+        if self.read_only:
+            raise RuntimeError("Index was loaded read-only from an artifact; rebuild it with build_index.py")
+
+    def upsert(self, entries, encode=True):
+        """
+        Insert or update FAQ entries (FAQEntry objects or entry dicts).
+        Only entries with a new question get a vector; answer or source
+        changes just replace the stored entry. Returns the affected IDs.
+        With encode=False new entries only go into the exact-match and BM25
+        tables until encode_pending() adds their vectors.
+        Call release_embedding_cache() after the last upsert of a batch.
+        """
+        self._check_writable()
+        batch = {}
+        for entry in map(as_entry, entries):
+            batch[entry.id] = entry
+        new_ids = [i for i in batch if i not in self.entries]
+        for i in new_ids:
+            self.lexical.add(i, batch[i].question)
+            self._add_exact(i, batch[i].question)
+        if new_ids and encode:
+            self._add_vectors(new_ids, batch)
+        else:
+            self._unencoded.extend(new_ids)
+        self.entries.update(batch)
+        self.revision += 1
+        return list(batch.keys())
+
+    def _add_vectors(self, ids, entries):
         """
-        Load FAQ data from JSON file
+        Encode the questions of new entries and add each vector to the
+        shard of the scheme its question names
+        """
+        if not ids:
+            return
+        embeddings = self._encode([entries[i].question for i in ids])
+        groups = {}
+        for row, i in enumerate(ids):
+            key = self._shard_key(entries[i])
+            self.shard_of[i] = key
+            # A tombstoned HNSW vector is still present and identical, so just
+            # revive it; the question, and so the shard, is the same
+            if i in self.tombstones:
+                self.tombstones.discard(i)
+            else:
+                groups.setdefault(key, []).append(row)
+        for key, rows in groups.items():
+            self._trained_shard(key, embeddings[rows]).add_with_ids(
+                embeddings[rows], np.array([ids[row] for row in rows], dtype='int64'))
+
+    def encode_pending(self, page_size=1000):
+        """
+        Add the vectors of entries upserted with encode=False, a page of
+        questions per encoder call
+        """
+        ids, self._unencoded = self._unencoded, []
+        try:
+            for start in range(0, len(ids), page_size):
+                self._add_vectors([i for i in ids[start:start + page_size] if i in self.entries], self.entries)
+        finally:
+            self.release_embedding_cache()
+        if ids:
+            self.revision += 1
+
+    def _add_exact(self, i, question):
+        """
+        Make an entry findable by its normalized question
+        """
+        self.exact_index.setdefault(normalize_query(question), []).append(i)
+
+    def _remove_exact(self, i, question):
+        """
+        Drop an entry from the exact-match index; the key stays while other
+        entries with the same normalized question remain
+        """
+        key = normalize_query(question)
+        ids = self.exact_index.get(key)
+        if ids is not None and i in ids:
+            ids.remove(i)
+            if not ids:
+                del self.exact_index[key]
+
+    def delete(self, ids):
+        """
+        Remove FAQ entries and their vectors by entry ID
+        """
+        self._check_writable()
+        ids = [i for i in ids if i in self.entries]
+        if not ids:
+            return ids
+        # Entries still waiting for their vectors (see encode_pending) have no shard
+        by_shard = {}
+        for i in ids:
+            self._remove_exact(i, self.entries.pop(i).question)
+            self.lexical.remove(i)
+            key = self.shard_of.pop(i, None)
+            if key is not None:
+                by_shard.setdefault(key, []).append(i)
+        if self.index_kind == 'hnsw':
+            for shard_ids in by_shard.values():
+                self.tombstones.update(shard_ids)
+            if len(self.tombstones) > HNSW_REBUILD_FRACTION * self.vector_count():
+                self.rebuild()
+        else:
+            for key, shard_ids in by_shard.items():
+                self.shards[key].remove_ids(np.array(shard_ids, dtype='int64'))
+        self.revision += 1
+        return ids
+
+    def release_embedding_cache(self):
+        """
+        Save newly encoded embeddings and drop the in-memory cache, so a
+        serving process does not keep a float32 copy next to the index
+        """
+        if self.embedding_cache is not None:
+            self.embedding_cache.release()
+
+    def rebuild(self):
+        """
+        Rebuild the shard indexes from the current entries, dropping tombstones
+        """
+        self.tombstones = set()
+        self._unencoded = []
+        self.shards = {}
+        self.shard_of = {}
+        ids = list(self.entries.keys())
+        if ids:
+            self._add_vectors(ids, self.entries)
+            self.release_embedding_cache()
+
+    def load_faq_data(self, faq_file_path, encode=True):
+        """
+        Load FAQ data from JSON file.
+        Safe to call again on reload: entries missing from the file are
+        deleted and only new questions are added to the index.
+        encode=False defers the vectors, as for upsert.
         """
         with open(faq_file_path, 'r', encoding='utf-8') as f:
-            self.faq_data = json.load(f)
+            faq_data = json.load(f)
         
-        # Create embeddings for all questions
-        questions = [entry['question'] for entry in self.faq_data]
-        self.embeddings = self.model.encode(questions)
+        current_ids = {entry_id(entry['question']) for entry in faq_data}
+        removed = self.delete([i for i in self.entries if i not in current_ids])
+        self.upsert(faq_data, encode)
+        self.release_embedding_cache()
         
-        # Add embeddings to FAISS index
-        self.index.add(np.array(self.embeddings).astype('float32'))
+        print(f"Loaded {len(self.entries)} FAQ entries ({len(removed)} removed)")
+
+    def load_store(self, store, page_size=1000, encode=True):
+        """
+        Load FAQ entries from a KnowledgeStore, a page at a time.
+        Safe to call again on reload, like load_faq_data.
+        """
+        # One read transaction, so the entries match the journal position.
+        # The embedding cache is read once for all pages and saved at the end.
+        with store.read_transaction():
+            current_ids = store.entry_ids()
+            removed = self.delete([i for i in self.entries if i not in current_ids])
+            page = []
+            try:
+                for entry in store.iter_entries(page_size):
+                    page.append(entry)
+                    if len(page) == page_size:
+                        self.upsert(page, encode)
+                        page = []
+                if page:
+                    self.upsert(page, encode)
+            finally:
+                self.release_embedding_cache()
+            self.kb_seq = store.journal_seq
         
-        print(f"Loaded {len(self.faq_data)} FAQ entries and created embeddings")
+        print(f"Loaded {len(self.entries)} FAQ entries from {store.path} ({len(removed)} removed)")
+
+    def sync_store(self, store):
+        """
+        Apply the KnowledgeStore changes made since the entries were loaded,
+        touching only the changed IDs. Falls back to load_store when the
+        journal has been compacted past kb_seq.
+        """
+        with store.read_transaction():
+            changes = store.changes_since(self.kb_seq) if self.kb_seq is not None else None
+            if changes is None:
+                self.load_store(store)
+                return
+            upserted, deleted, seq = changes
+            removed = self.delete(deleted)
+            changed = store.get_many(upserted)
+            self.upsert(changed.values())
+            self.release_embedding_cache()
+            self.kb_seq = seq
+        
+        print(f"Synced {len(changed)} changed and {len(removed)} removed FAQ entries from {store.path}")
+
+    def load_kb(self, kb_path, encode=True):
+        """
+        Load a knowledge base: a SQLite store (.db) or a JSON FAQ file.
+        encode=False defers the vectors, as for upsert.
+        """
+        if is_store_path(kb_path):
+            with KnowledgeStore(kb_path, read_only=True) as store:
+                self.load_store(store, encode=encode)
+        else:
+            self.load_faq_data(kb_path, encode)
         
+    def get_exact(self, query):
+        """
+        Return the entry whose question matches the query after folding case,
+        punctuation, whitespace and fund aliases, without touching the
+        encoder; None if there is none
+        """
+        ids = self.exact_index.get(normalize_query(query))
+        if not ids:
+            search_stats['exact_misses'] += 1
+            return None
+        search_stats['exact_hits'] += 1
+        # The most recently added entry wins
+        idx = ids[-1]
+        return self._result(idx, self.entries[idx], 1.0 if self.metric == 'cosine' else 0.0)
+
+    def get_entry(self, idx):
+        """
+        An entry as an unscored search result by its ID, or None if it is
+        no longer in the index
+        """
+        entry = self.entries.get(idx)
+        if entry is None:
+            return None
+        return self._result(idx, entry, None)
+
     def search(self, query, k=3):
         """
         Search for the most similar FAQ entries to the query
         Returns the top k most similar entries
         """
-        # Encode the query
-        query_embedding = self.model.encode([query])
+        return self.search_batch([query], k)[0]
+
+    def encode_queries(self, queries):
+        """
+        Encode queries the way search_batch does, so the embeddings can be
+        inspected (e.g. by the response cache) and then passed back in
+        """
+        search_stats['encoded_queries'] += len(queries)
+        return self._prepare(self.model.encode(list(queries)))
+
+    def search_batch(self, queries, k=3, query_embeddings=None):
+        """
+        Search for the most similar FAQ entries to each query.
+        Uses one encode call for the whole batch (skipped when
+        query_embeddings from encode_queries are given) and one FAISS search
+        per shard searched.
+        Returns a list with the top k entries for every query.
+        """
+        if not queries:
+            return []
+        if not self.entries:
+            return [[] for _ in queries]
         
-        # Search in the FAISS index
-        distances, indices = self.index.search(np.array(query_embedding).astype('float32'), k)
+        # Encode all queries together
+        if query_embeddings is None:
+            query_embeddings = self.encode_queries(queries)
         
-        # Return the most similar FAQ entries
-        results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.faq_data):  # Check bounds
-                results.append({
-                    'question': self.faq_data[idx]['question'],
-                    'answer': self.faq_data[idx]['answer'],
-                    'source': self.faq_data[idx]['source'],
-                    'distance': float(distances[0][i])
-                })
+        # Queries naming a scheme only search that scheme's shard plus the
+        # general shard; the rest fan out across every shard
+        routes = [self.route(query) for query in queries]
+        search_stats['routed_queries'] += sum(route is not None for route in routes)
+        candidates = [[] for _ in queries]
+        shard_rows = {}
+        for n, route in enumerate(routes):
+            for key in self.shards if route is None else route:
+                shard_rows.setdefault(key, []).append(n)
+        for key, rows in shard_rows.items():
+            # Over-fetch to make up for tombstones
+            self._collect(self.shards[key], query_embeddings, rows, k + len(self.tombstones), candidates)
+        
+        # Return the most similar FAQ entries for each query
+        all_results = []
+        for row in candidates:
+            if self.metric == 'l2':
+                row.sort(key=lambda hit: hit[0])
+            else:
+                row.sort(key=lambda hit: hit[0], reverse=True)
+            results = []
+            for score, idx in row:
+                entry = self.entries.get(idx)
+                if entry is not None and len(results) < k:
+                    results.append(self._result(idx, entry, score))
+            all_results.append(results)
         
+        return all_results
+
+    def route(self, query):
+        """
+        Shards to search for a query, or None to fan out across all of them
+        """
+        if self.router is None:
+            return None
+        keys = [key for key in self.router.route(query) if key in self.shards and self.shards[key].ntotal]
+        if not keys:
+            return None
+        if GENERAL_SHARD in self.shards:
+            keys.append(GENERAL_SHARD)
+        return keys
+
+    def _collect(self, index, query_embeddings, rows, k, candidates):
+        """
+        Search one shard for the given query rows and append (raw score, ID)
+        hits to each row's candidate list
+        """
+        k = min(k, index.ntotal)
+        if k <= 0:
+            return
+        # Vectors in the shards searched, per query; routed queries should
+        # add far fewer than the whole database
+        search_stats['shard_vectors_searched'] += index.ntotal * len(rows)
+        scores, indices = index.search(query_embeddings[rows], k)
+        for n, row_scores, row_indices in zip(rows, scores, indices):
+            # -1 marks a missing neighbour
+            candidates[n].extend((float(score), int(idx)) for score, idx in zip(row_scores, row_indices) if idx != -1)
+
+    def lexical_search(self, query, k=3):
+        """
+        BM25-only search; needs neither the encoder nor the vector index
+        """
+        results = []
+        for idx, bm25_score in self.lexical.search(query, k):
+            result = self._result(idx, self.entries[idx], None)
+            result['bm25_score'] = bm25_score
+            results.append(result)
         return results
 
-# Initialize global vector database
+    def hybrid_search(self, query, k=3, candidates=10):
+        """
+        Search with BM25 and the vector index together
+        """
+        return self.hybrid_search_batch([query], k, candidates)[0]
+
+    def hybrid_search_batch(self, queries, k=3, candidates=10, query_embeddings=None):
+        """
+        Fuse BM25 and vector rankings for each query with reciprocal-rank fusion.
+        A vector hit above the match threshold stays on top, so lexical
+        evidence only reorders the uncertain cases. Results carry the vector
+        'score' (None for lexical-only hits), 'bm25_score' and 'rrf_score'.
+        """
+        all_vector_results = self.search_batch(queries, max(k, candidates), query_embeddings)
+        all_results = []
+        for query, vector_results in zip(queries, all_vector_results):
+            lexical_hits = self.lexical.search(query, max(k, candidates))
+            bm25_scores = dict(lexical_hits)
+            by_id = {result['id']: result for result in vector_results}
+            fused = reciprocal_rank_fusion([
+                [result['id'] for result in vector_results],
+                [doc_id for doc_id, _ in lexical_hits]
+            ])
+            if vector_results and self.is_match(vector_results[0]):
+                top_id = vector_results[0]['id']
+                fused.sort(key=lambda item: item[0] != top_id)
+            
+            results = []
+            for idx, rrf_score in fused[:k]:
+                result = by_id.get(idx) or self._result(idx, self.entries[idx], None)
+                result['bm25_score'] = bm25_scores.get(idx, 0.0)
+                result['rrf_score'] = rrf_score
+                results.append(result)
+            all_results.append(results)
+        return all_results
+
+    def _result(self, idx, entry, raw_score):
+        """
+        Build a search result; 'score' is higher-is-better for both metrics
+        and None when the entry was not scored by the vector index
+        """
+        if raw_score is None:
+            score, distance = None, None
+        elif self.metric == 'cosine':
+            score, distance = raw_score, 1.0 - raw_score
+        else:
+            score, distance = -raw_score, raw_score
+        return {
+            'id': idx,
+            'question': entry.question,
+            'answer': entry.answer,
+            'source': entry.source,
+            'score': score,
+            'distance': distance
+        }
+
+    def calibrate_threshold(self, labelled_queries):
+        """
+        Tune the match threshold on (query, expected_question) pairs, where
+        expected_question is None for queries that must not match any entry.
+        Picks the cutoff that accepts the most correct top-1 hits while
+        rejecting wrong ones, stores it in the metadata and returns it.
+        """
+        queries = [query for query, _ in labelled_queries]
+        top_hits = [results[0] if results else None for results in self.search_batch(queries, k=1)]
+        
+        # (score, should_accept) for every query with a hit
+        samples = []
+        for (_, expected), hit in zip(labelled_queries, top_hits):
+            if hit is None:
+                continue
+            correct = expected is not None and entry_id(expected) == hit['id']
+            samples.append((hit['score'], correct))
+        if not samples:
+            return self.match_threshold
+        
+        # Try a cutoff between every pair of neighbouring scores
+        scores = sorted({score for score, _ in samples})
+        candidates = [scores[0] - 1e-6] + [(a + b) / 2 for a, b in zip(scores, scores[1:])] + [scores[-1] + 1e-6]
+        best_threshold, best_correct = self.match_threshold, -1
+        for threshold in candidates:
+            decided_right = sum(1 for score, correct in samples if (score >= threshold) == correct)
+            if decided_right > best_correct:
+                best_threshold, best_correct = threshold, decided_right
+        
+        self.metadata['match_threshold'] = float(best_threshold)
+        self.metadata['calibration_accuracy'] = best_correct / len(samples)
+        self.metadata['calibration_samples'] = len(samples)
+        return self.metadata['match_threshold']
+
+    def save_artifact(self, kb_path, artifact_root=ARTIFACT_DIR, build_started=None):
+        """
+        Write the shard indexes, a compact metadata table and a manifest to a new
+        versioned directory and point CURRENT at it. kb_path is the store or
+        FAQ file the entries came from; build_started, a time.perf_counter()
+        value, records how long the build took. Returns the directory.
+        """
+        import faiss
+        if self._unencoded:
+            self.encode_pending()
+        if self.tombstones:
+            self.rebuild()
+        fingerprint = kb_fingerprint(kb_path)
+        if 'kb_sha1' in fingerprint:
+            kb_tag = fingerprint['kb_sha1'][:8]
+        else:
+            kb_tag = f"{fingerprint['kb_store_id'][:4]}r{fingerprint['kb_revision']}"
+        version = time.strftime('%Y%m%dT%H%M%S') + '-' + kb_tag
+        artifact_dir = os.path.join(artifact_root, version)
+        tmp_dir = artifact_dir + '.tmp'
+        os.makedirs(tmp_dir, exist_ok=True)
+        
+        # One file per shard; shard keys are scheme slugs, safe as file names
+        os.makedirs(os.path.join(tmp_dir, 'shards'), exist_ok=True)
+        for key, index in self.shards.items():
+            faiss.write_index(index, os.path.join(tmp_dir, 'shards', f'{key}.faiss'))
+        
+        # Binary snapshot with each distinct source URL stored once, whose
+        # answers are only read when displayed (see kb_snapshot)
+        entry_count = write_snapshot(os.path.join(tmp_dir, 'entries.snap'), self.entries.values())
+        
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'model_name': self.model_name,
+            'encoder': encoder_name(self.model_name),
+            'dimension': self.dimension,
+            'metric': self.metric,
+            'index_kind': self.index_kind,
+            'index_params': self.index_params,
+            'storage': self.storage,
+            'shards': sorted(self.shards),
+            'match_threshold': self.match_threshold,
+            'entries': entry_count,
+            'kb_path': kb_path,
+            'kb_seq': self.kb_seq if is_store_path(kb_path) else None,
+            'build_seconds': time.perf_counter() - build_started if build_started is not None else None,
+            **fingerprint
+        }
+        with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        
+        if os.path.isdir(artifact_dir):
+            # Rebuilt from the same data within the same second
+            shutil.rmtree(artifact_dir)
+        os.replace(tmp_dir, artifact_dir)
+        write_current_artifact(artifact_root, version)
+        return artifact_dir
+
+    def load_artifact(self, artifact_dir, mmap=True):
+        """
+        Load an artifact written by save_artifact, read-only. FAISS only
+        memory-maps the inverted lists of IVF indexes, so worker processes
+        share one page-cache copy of those; flat and HNSW vectors are read
+        into each process (the entry snapshot is mapped either way). With
+        mmap=False the shards are read into memory and stay writable, e.g.
+        to extend it into the next artifact.
+        """
+        with open(os.path.join(artifact_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format in {artifact_dir}")
+        if manifest['model_name'] != self.model_name:
+            raise ValueError(f"Artifact {artifact_dir} was built with {manifest['model_name']}, not {self.model_name}")
+        # Query embeddings must come from the same backend and graph as the indexed ones
+        if manifest.get('encoder') != encoder_name(self.model_name):
+            raise ValueError(f"Artifact {artifact_dir} was built with the {manifest.get('encoder')} encoder, "
+                             f"not {encoder_name(self.model_name)}")
+        
+        import faiss
+        self.shards = {}
+        self.shard_of = {}
+        for key in manifest['shards']:
+            index_path = os.path.join(artifact_dir, 'shards', f'{key}.faiss')
+            if not mmap:
+                index = faiss.read_index(index_path)
+            else:
+                try:
+                    index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                except RuntimeError as e:
+                    # Not every index type can be memory-mapped
+                    print(f"Memory-mapping {index_path} failed ({e}), reading it into memory")
+                    index = faiss.read_index(index_path)
+            self.shards[key] = index
+            for i in faiss.vector_to_array(index.id_map):
+                self.shard_of[int(i)] = key
+        self.read_only = mmap
+        
+        # Answers stay in the mapped snapshot until an entry is displayed
+        self.snapshot = KBSnapshot(os.path.join(artifact_dir, 'entries.snap'))
+        self.entries = self.snapshot.entries()
+        self.lexical = BM25Index()
+        self.exact_index = {}
+        for i, entry in self.entries.items():
+            self.lexical.add(i, entry.question)
+            self._add_exact(i, entry.question)
+        self.tombstones = set()
+        self._unencoded = []
+        self.metric = manifest['metric']
+        self.index_kind = manifest['index_kind']
+        self.index_params = manifest['index_params']
+        self.storage = manifest['storage']
+        self._dimension = manifest['dimension']
+        self.kb_seq = manifest.get('kb_seq')
+        for index in self.shards.values():
+            set_search_params(faiss.downcast_index(index.index), self.index_kind, self.index_params)
+        self.metadata = self._load_metadata(self.model_name)
+        self.metadata['match_threshold'] = manifest['match_threshold']
+        self.manifest = manifest
+        print(f"Loaded index artifact {manifest['version']} with {len(self.entries)} FAQ entries")
+
+def file_sha1(path):
+    """
+    SHA-1 of a file's contents
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_current_artifact(artifact_root, version):
+    """
+    Atomically point CURRENT at an artifact version
+    """
+    tmp_path = os.path.join(artifact_root, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(artifact_root, 'CURRENT'))
+
+def current_artifact_dir(artifact_root=ARTIFACT_DIR):
+    """
+    Directory of the live artifact, or None if none has been built
+    """
+    try:
+        with open(os.path.join(artifact_root, 'CURRENT'), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    artifact_dir = os.path.join(artifact_root, version)
+    return artifact_dir if os.path.isdir(artifact_dir) else None
+
+def is_store_path(kb_path):
+    """
+    Whether a knowledge-base path names a SQLite KnowledgeStore rather
+    than a JSON FAQ file
+    """
+    return kb_path.endswith('.db')
+
+def kb_fingerprint(kb_path):
+    """
+    Manifest fields identifying the contents of a knowledge base: the
+    store ID and revision of a KnowledgeStore, or the hash, size and
+    modification time of a JSON FAQ file
+    """
+    if is_store_path(kb_path):
+        # Polled by every serving process, so read-only: no schema setup, no write lock
+        with KnowledgeStore(kb_path, read_only=True) as store:
+            with store.read_transaction():
+                return {'kb_store_id': store.store_id, 'kb_revision': store.revision}
+    kb_stat = os.stat(kb_path)
+    return {'kb_sha1': file_sha1(kb_path), 'kb_size': kb_stat.st_size, 'kb_mtime_ns': kb_stat.st_mtime_ns}
+
+def artifact_is_current(artifact_dir, kb_path):
+    """
+    Whether an artifact was built from the current contents of the
+    knowledge store or FAQ file
+    """
+    with open(os.path.join(artifact_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if is_store_path(kb_path):
+        fingerprint = kb_fingerprint(kb_path)
+        return all(manifest.get(key) == value for key, value in fingerprint.items())
+    kb_stat = os.stat(kb_path)
+    if (manifest.get('kb_size'), manifest.get('kb_mtime_ns')) == (kb_stat.st_size, kb_stat.st_mtime_ns):
+        return True
+    return manifest.get('kb_sha1') == file_sha1(kb_path)
+
+def prune_artifacts(artifact_root=ARTIFACT_DIR, keep=3):
+    """
+    Delete all but the newest artifact versions, never the live one
+    """
+    current = current_artifact_dir(artifact_root)
+    versions = sorted(
+        name for name in os.listdir(artifact_root)
+        if os.path.isdir(os.path.join(artifact_root, name)) and not name.endswith('.tmp')
+    )
+    for name in versions[:-keep]:
+        path = os.path.join(artifact_root, name)
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+# JSON knowledge base served when there is no knowledge store
+FAQ_FILE_PATH = 'mf_faq_data.json'
+
+# Results of recent searches, shared by every index generation.
+# It is bound to the (generation, revision) of the index serving each
+# search, so it empties itself when a reload swaps in a new index.
+response_cache = ResponseCache()
+
+# Initialize global vector database.
+# It is only ever replaced wholesale, so a search that has grabbed the
+# current object keeps using a complete index while a new one is built.
 vector_db = None
+_vector_db_lock = threading.Lock()
+# The first index while its questions are still being encoded; its
+# entries, exact-match and BM25 tables are complete already
+_loading_db = None
+_entries_loaded = threading.Event()
+_hot_reload_lock = threading.Lock()
+_hot_reload_thread = None
+
+def kb_source():
+    """
+    Knowledge base to serve: the SQLite store once it exists, else the
+    JSON FAQ file
+    """
+    return KNOWLEDGE_DB_PATH if os.path.exists(KNOWLEDGE_DB_PATH) else FAQ_FILE_PATH
+
+def kb_generation(kb_path=None):
+    """
+    Identify the current knowledge-base generation: the live artifact
+    version plus the store's revision, or the FAQ file's size and
+    modification time
+    """
+    kb_path = kb_path or kb_source()
+    artifact_dir = current_artifact_dir()
+    if is_store_path(kb_path):
+        fingerprint = kb_fingerprint(kb_path)
+        kb_state = (fingerprint['kb_store_id'], fingerprint['kb_revision'])
+    else:
+        try:
+            kb_stat = os.stat(kb_path)
+            kb_state = (kb_stat.st_size, kb_stat.st_mtime_ns)
+        except FileNotFoundError:
+            kb_state = None
+    return (os.path.basename(artifact_dir) if artifact_dir else None, kb_state)
+
+def load_vector_db(kb_path=None, model=None, on_entries_loaded=None):
+    """
+    Build a new VectorDB for the current knowledge-base generation,
+    preferring a prebuilt artifact that matches the knowledge base.
+    Without one, the entries are loaded first and on_entries_loaded(db)
+    is called before the questions are encoded, so lookups that need no
+    encoder can start.
+    """
+    kb_path = kb_path or kb_source()
+    generation = kb_generation(kb_path)
+    db = VectorDB(model=model)
+    db.generation = generation
+    artifact_dir = current_artifact_dir()
+    if not os.path.exists(kb_path):
+        print(f"FAQ file {kb_path} not found")
+        return db
+    if artifact_dir and artifact_is_current(artifact_dir, kb_path):
+        # Prebuilt by build_index.py: no encoding needed
+        try:
+            db.load_artifact(artifact_dir)
+            return db
+        except ValueError as e:
+            # Built for another model, encoder or format: index the knowledge base here instead
+            print(f"Not using index artifact: {e}")
+            db = VectorDB(model=model)
+            db.generation = generation
+    db.load_kb(kb_path, encode=False)
+    if on_entries_loaded is not None:
+        on_entries_loaded(db)
+    db.encode_pending()
+    return db
+
+def _publish_loading_db(db):
+    global _loading_db
+    _loading_db = db
+    _entries_loaded.set()
 
 def initialize_vector_db():
     """
     Initialize the global vector database
     """
-    global vector_db
+    global vector_db, _loading_db
     if vector_db is None:
-        vector_db = VectorDB()
-        faq_file_path = 'mf_faq_data.json'
-        if os.path.exists(faq_file_path):
-            vector_db.load_faq_data(faq_file_path)
-        else:
-            print(f"FAQ file {faq_file_path} not found")
+        with _vector_db_lock:
+            if vector_db is None:
+                try:
+                    vector_db = load_vector_db(on_entries_loaded=_publish_loading_db)
+                finally:
+                    _loading_db = None
+                    # Wake exact-match lookups even if loading failed
+                    _entries_loaded.set()
     return vector_db
 
+def exact_match_db():
+    """
+    Index for lookups that need no encoder (get_exact): the served one,
+    or while the first one is still being encoded, its entries. Only
+    waits for the entries to load, not for the encoder.
+    """
+    db = vector_db
+    if db is None and _vector_db_lock.locked():
+        _entries_loaded.wait()
+        db = vector_db or _loading_db
+    return db or initialize_vector_db()
+
+def reload_vector_db_if_changed():
+    """
+    Build an index for a new knowledge-base generation and swap it in.
+    The old index keeps serving until the new one is complete.
+    Returns True if a new index was swapped in.
+    """
+    global vector_db
+    current = initialize_vector_db()
+    if kb_generation() == current.generation:
+        return False
+    # Reuse the loaded encoder; only the index and entries are rebuilt
+    new_db = load_vector_db(model=current._model)
+    with _vector_db_lock:
+        vector_db = new_db
+    response_cache.bind((new_db.generation, new_db.revision))
+    print(f"Swapped in vector database for knowledge-base generation {new_db.generation}")
+    return True
+
+def get_vector_db_if_ready():
+    """
+    The global vector database if it has finished loading, else None
+    """
+    return vector_db
+
+def warm_up(background=True):
+    """
+    Load the index and the encoder ahead of the first query, by default in
+    a background thread so the UI can render meanwhile
+    """
+    def _warm_up():
+        try:
+            initialize_vector_db().warm_up()
+        except Exception as e:
+            print(f"Error warming up vector database: {e}")
+    if not background:
+        _warm_up()
+        return None
+    thread = threading.Thread(target=_warm_up, name='vector-db-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+def _hot_reload_loop(interval):
+    """
+    Poll for new knowledge-base generations forever
+    """
+    while True:
+        time.sleep(interval)
+        try:
+            reload_vector_db_if_changed()
+        except Exception as e:
+            # Keep serving the previous index if the new one cannot be built
+            print(f"Error reloading vector database: {e}")
+
+def start_hot_reload(interval=30):
+    """
+    Start a background thread that picks up new scraper output
+    (a rebuilt artifact or a changed FAQ file). Safe to call repeatedly.
+    """
+    global _hot_reload_thread
+    with _hot_reload_lock:
+        if _hot_reload_thread is None:
+            _hot_reload_thread = threading.Thread(target=_hot_reload_loop, args=(interval,),
+                                                  name='vector-db-hot-reload', daemon=True)
+            _hot_reload_thread.start()
+    return _hot_reload_thread
+
+def cached_search(db, query, k=3, hybrid=False):
+    """
+    Search through the response cache: an identical normalized query, then
+    a semantically close one about the same schemes, then the index itself.
+    A miss reuses the query embedding computed for the semantic lookup.
+    """
+    response_cache.bind((db.generation, db.revision))
+    key = (normalize_query(query), k, hybrid)
+    results = response_cache.get(key)
+    if results is not None:
+        return results
+    if not db.entries:
+        return []
+    
+    query_embeddings = db.encode_queries([query])
+    # Semantic hits must also agree on k, the search mode and the schemes named
+    routes = tuple(db.router.route(query)) if db.router is not None else ()
+    scope = (k, hybrid, routes)
+    results = response_cache.get_similar(query_embeddings[0], scope)
+    if results is not None:
+        return results
+    
+    if hybrid:
+        results = db.hybrid_search_batch([query], k, query_embeddings=query_embeddings)[0]
+    else:
+        results = db.search_batch([query], k, query_embeddings)[0]
+    response_cache.put(key, results, query_embeddings[0], scope)
+    return results
+
 def search_similar_questions(query, k=3):
     """
     Search for similar questions in the vector database
     """
     db = initialize_vector_db()
-    return db.search(query, k)
\ No newline at end of file
+    return cached_search(db, query, k)
+
+def search_similar_questions_batch(queries, k=3):
+    """
+    Search for similar questions for a batch of queries at once
+    """
+    db = initialize_vector_db()
+    return db.search_batch(queries, k)
+
+def hybrid_search_similar_questions(query, k=3):
+    """
+    Search the vector database with fused BM25 and vector ranking
+    """
+    db = initialize_vector_db()
+    return cached_search(db, query, k, hybrid=True)
+
+def get_search_stats():
+    """
+    Retrieval counters with the exact-match hit rate, i.e. the share of
+    exact-match lookups that skipped the encoder
+    """
+    stats = dict(search_stats)
+    lookups = stats.get('exact_hits', 0) + stats.get('exact_misses', 0)
+    stats['exact_hit_rate'] = stats.get('exact_hits', 0) / lookups if lookups else 0.0
+    stats['response_cache'] = response_cache.get_stats()
+    return stats